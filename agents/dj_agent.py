@@ -1,7 +1,10 @@
 import os
-import subprocess
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
 import platform
+from typing import Any, Iterator
 
 # libsonic is not available on Windows, so we'll guard the import.
 try:
@@ -10,20 +13,48 @@ except ImportError:
     libsonic = None
 
 from core.user_profile import UserProfile
+from core.ollama_client import OllamaClient
+from core.http_transport import get_transport
+from core.subsonic_connection import TransportConnection
+from core.text_stream import split_sentences
+from core.commentary_cache import CommentaryCache
+from core.library_index import LibraryIndex
+from core.track_pool import TrackPool
+from core.metrics import metrics, timed
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Per-branch budgets for a vibe: a slow Navidrome must not hold up commentary and vice versa.
+COMMENTARY_TIMEOUT = float(os.getenv("COMMENTARY_TIMEOUT", "35"))
+NAVIDROME_TIMEOUT = float(os.getenv("NAVIDROME_TIMEOUT", "10"))
+
+# Local SQLite mirror of the Navidrome library used for track selection.
+LIBRARY_INDEX_ENABLED = os.getenv("LIBRARY_INDEX", "true").lower() in ("1", "true", "yes")
+LIBRARY_SYNC_INTERVAL = float(os.getenv("LIBRARY_SYNC_INTERVAL", "3600"))  # seconds
+
 class DJAgent:
     """The DJ agent, responsible for generating commentary and selecting tracks from Navidrome."""
     MODEL = "gemma3:4b"  # keep small; swap later
+    FALLBACK_COMMENTARY = "Let's get right to the music."
 
     def __init__(self, logger, profile_name: str = "default"):
         """Initializes the DJ agent and connects to Navidrome."""
         self.logger = logger
         self.navidrome_client = None
+        self.library_index = None
+        self.track_pool = None
+        self._shutdown = threading.Event()
         self.user_profile = UserProfile(profile_name)
+        self.ollama = OllamaClient(logger, self.MODEL)
+        self.commentary_cache = CommentaryCache(logger)
+        # Shared pool so commentary generation and track selection run side by side.
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dj-agent")
+        # Load the model in the background so the first vibe doesn't wait for it.
+        self.executor.submit(self.ollama.warm_up)
         self._connect_to_navidrome()
+        self._start_library_index()
+        self._start_track_pool()
 
     def _connect_to_navidrome(self):
         if not libsonic:
@@ -44,7 +75,8 @@ class DJAgent:
                 self.logger.error("Navidrome credentials not found in .env file.")
                 return
 
-            self.navidrome_client = libsonic.Connection(
+            self.navidrome_client = TransportConnection(
+                get_transport(self.logger),
                 baseUrl=url, username=user, password=password, appName="PersonalDJ"
             )
             self.navidrome_client.ping()
@@ -53,19 +85,45 @@ class DJAgent:
             self.logger.error(f"Failed to connect to Navidrome: {e}")
             self.navidrome_client = None
 
-    def _ollama_chat(self, prompt: str) -> str:
+    def _start_library_index(self):
+        """Opens the local library index and keeps it synced in a background thread."""
+        if not self.navidrome_client or not LIBRARY_INDEX_ENABLED:
+            return
+        try:
+            self.library_index = LibraryIndex(self.logger)
+        except Exception as e:
+            self.logger.error(f"Failed to open the local library index: {e}")
+            return
+        threading.Thread(target=self._sync_library_loop, name="library-sync", daemon=True).start()
+
+    def _start_track_pool(self):
+        """Fills the random-track pool in the background so selection needs no round-trip."""
+        if not self.navidrome_client:
+            return
+        self.track_pool = TrackPool(self.logger, self.navidrome_client, executor=self.executor)
+        self.track_pool.refill_async()
+
+    def _sync_library_loop(self):
+        """Syncs the library index now and then every LIBRARY_SYNC_INTERVAL seconds."""
+        while not self._shutdown.is_set():
+            try:
+                self.library_index.sync(self.navidrome_client)
+            except Exception as e:
+                self.logger.error(f"Library index sync failed: {e}")
+            self._shutdown.wait(LIBRARY_SYNC_INTERVAL)
+
+    @timed("ollama_chat")
+    def _ollama_chat(self, prompt: str, system: str = None) -> str:
         self.logger.info("Generating commentary with Ollama...")
         try:
-            result = subprocess.run(
-                ["ollama", "run", self.MODEL, prompt],
-                text=True, capture_output=True, check=True, timeout=30
-            )
-            response = result.stdout.strip()
+            response = self.ollama.generate(prompt, system=system)
             self.logger.info(f"Ollama response: '{response}'")
             return response
         except Exception as e:
             self.logger.error(f"An unexpected error occurred with Ollama: {e}", exc_info=True)
-            return "Let's get right to the music."
+            # Handled here, so timed() never sees it.
+            metrics.increment("ollama_chat.errors")
+            return self.FALLBACK_COMMENTARY
 
     def _get_now_playing(self) -> tuple[str | None, str | None]:
         """Returns the currently playing track in Navidrome, if any."""
@@ -90,20 +148,46 @@ class DJAgent:
             self.logger.error(f"Failed to fetch now playing track from Navidrome: {e}")
             return None, None
 
-    def _get_track_from_navidrome(self) -> tuple[str | None, str | None]:
-        """Fetches a random track from Navidrome and returns its title and stream URL."""
+    def _get_track_from_index(self, vibe: str | None) -> tuple[str | None, str | None]:
+        """Picks a track from the local library index, preferring genres named in the vibe."""
+        if not self.library_index:
+            return None, None
+
+        recent = self.track_pool.recent_ids() if self.track_pool else []
+        genres = self.library_index.match_genres(vibe) if vibe else []
+        song = self.library_index.pick_random(genres=genres, exclude_ids=recent) if genres else None
+        if song is None:
+            song = self.library_index.pick_random(exclude_ids=recent)
+        if song is None:
+            return None, None
+        if self.track_pool:
+            self.track_pool.mark_played(song['id'])
+
+        song_title = f"{song['artist']} - {song['title']}"
+        self.logger.info(f"Selected track from library index: '{song_title}' (ID: {song['id']})")
+        # Building the stream URL is local to libsonic; no network round-trip.
+        return song_title, self.navidrome_client.getStreamUrl(sid=song['id'])
+
+    @timed("navidrome_track")
+    def _get_track_from_navidrome(self, vibe: str | None = None) -> tuple[str | None, str | None]:
+        """Picks a track (from the local index or random-track pool) and returns its title and stream URL."""
         if not self.navidrome_client:
             self.logger.error("Cannot get track: Not connected to Navidrome.")
             return None, None
 
-        self.logger.info("Fetching a random track from Navidrome...")
         try:
-            random_songs = self.navidrome_client.getRandomSongs(size=1)
-            if not random_songs or 'song' not in random_songs['randomSongs']:
+            song_title, stream_url = self._get_track_from_index(vibe)
+            if stream_url:
+                return song_title, stream_url
+        except Exception as e:
+            self.logger.error(f"Library index lookup failed, falling back to Navidrome: {e}")
+
+        try:
+            song = self.track_pool.take()
+            if not song:
                 self.logger.warning("Navidrome returned no random songs.")
                 return None, None
 
-            song = random_songs['randomSongs']['song'][0]
             song_id = song['id']
             song_title = f"{song['artist']} - {song['title']}"
             self.logger.info(f"Selected track: '{song_title}' (ID: {song_id})")
@@ -113,25 +197,135 @@ class DJAgent:
             return song_title, stream_url
         except Exception as e:
             self.logger.error(f"Failed to fetch track from Navidrome: {e}")
+            metrics.increment("navidrome_track.errors")
             return None, None
 
-    def respond(self, user_msg: str) -> tuple[str, str | None, str | None]:
-        self.logger.info(f"DJ Agent responding to: '{user_msg}'")
-        
+    def build_prompt(self, user_msg: str, record_request: bool = True) -> tuple[str, str, str]:
+        """
+        Records the request and builds the commentary prompt as (system, prompt, cache key).
+        The system part only changes when the profile does, so Ollama can reuse its prompt cache.
+        """
         # Get personalized context from user profile
-        personalized_context = self.user_profile.get_personalized_prompt_context()
+        system_prefix = self.user_profile.get_system_prompt_prefix()
+        request_context = self.user_profile.get_request_prompt_context(vibe=user_msg)
+        cache_key = CommentaryCache.make_key(user_msg, f"{system_prefix} {request_context}".strip())
         
         # Record this interaction
-        self.user_profile.record_interaction("user_request", {"message": user_msg, "timestamp": self.user_profile.last_updated})
+        if record_request:
+            self.user_profile.record_interaction("user_request", {"message": user_msg, "timestamp": self.user_profile.last_updated})
         
         # Create personalized prompt
-        prompt = (
-            f"{personalized_context} "
-            f"User said: {user_msg}\n"
+        system = (
+            f"{system_prefix}\n"
             "Reply with one-sentence commentary that reflects your personality and what you know about the user. "
             "Do NOT mention the track path or title."
         )
-        
-        commentary = self._ollama_chat(prompt)
-        track_title, track_url = self._get_track_from_navidrome()
+        prompt = f"{request_context} User said: {user_msg}" if request_context else f"User said: {user_msg}"
+        return system, prompt, cache_key
+
+    def _generate_commentary(self, system: str, prompt: str, cache_key: str) -> str:
+        """Generates fresh commentary and stores it as a cache variant."""
+        commentary = self._ollama_chat(prompt, system)
+        if commentary and commentary != self.FALLBACK_COMMENTARY:
+            self.commentary_cache.put(cache_key, commentary)
+        return commentary
+
+    def _get_cached_commentary(self, system: str, prompt: str, cache_key: str) -> str | None:
+        """
+        Returns a cached variant for this vibe, if any. While the key still has room
+        for more variants, a fresh one is generated in the background for next time.
+        """
+        cached = self.commentary_cache.get(cache_key)
+        if cached is None:
+            return None
+        self.logger.info(f"Commentary cache hit: '{cached}'")
+        if self.commentary_cache.needs_variants(cache_key):
+            self.executor.submit(self._generate_commentary, system, prompt, cache_key)
+        return cached
+
+    def respond(self, user_msg: str, record_request: bool = True) -> tuple[str, str | None, str | None]:
+        """
+        Generates commentary and picks a track for a vibe. Background lookahead passes
+        `record_request=False` so prefetching doesn't count as a user request.
+        """
+        self.logger.info(f"DJ Agent responding to: '{user_msg}'")
+        system, prompt, cache_key = self.build_prompt(user_msg, record_request)
+
+        # Both branches are independent, so run them concurrently and join.
+        started = time.monotonic()
+        track_future = self.select_track_async(user_msg)
+        commentary = self._get_cached_commentary(system, prompt, cache_key)
+        if commentary is None:
+            commentary_future = self.executor.submit(self._generate_commentary, system, prompt, cache_key)
+            commentary = self._join(commentary_future, started + COMMENTARY_TIMEOUT,
+                                    self.FALLBACK_COMMENTARY, "Commentary generation")
+        track_title, track_url = self.wait_for_track(track_future, started + NAVIDROME_TIMEOUT)
         return commentary, track_title, track_url
+
+    def commentary_stream(self, system: str, prompt: str, cache_key: str) -> Iterator[str]:
+        """Yields the commentary for a prompt from `build_prompt`, sentence by sentence."""
+        cached = self._get_cached_commentary(system, prompt, cache_key)
+        if cached is not None:
+            yield from split_sentences([cached])
+            return
+
+        self.logger.info("Streaming commentary from Ollama...")
+        sentences = []
+        completed = False
+        started = time.perf_counter()
+        tokens = self.ollama.generate_stream(prompt, system=system)
+        try:
+            for sentence in split_sentences(tokens):
+                if not sentences:
+                    metrics.record("ollama_first_sentence", time.perf_counter() - started)
+                sentences.append(sentence)
+                self.logger.info(f"Ollama sentence: '{sentence}'")
+                yield sentence
+            completed = True
+        except Exception as e:
+            self.logger.error(f"An unexpected error occurred with Ollama: {e}", exc_info=True)
+            metrics.increment("ollama_first_sentence.errors")
+        finally:
+            # Also runs when the caller closes us early: drops the HTTP stream so Ollama stops generating.
+            tokens.close()
+
+        if not sentences:
+            yield self.FALLBACK_COMMENTARY
+        elif completed:
+            # Only cache complete commentary, never a stream that broke off halfway.
+            self.commentary_cache.put(cache_key, " ".join(sentences))
+
+    def select_track(self, vibe: str = None) -> tuple[str | None, str | None]:
+        """Picks the next track to play for a vibe and returns its title and stream URL."""
+        return self._get_track_from_navidrome(vibe)
+
+    def select_track_async(self, vibe: str = None) -> Future:
+        """Starts track selection on the shared executor; join it with `wait_for_track`."""
+        return self.executor.submit(self.select_track, vibe)
+
+    def wait_for_track(self, future: Future, deadline: float = None) -> tuple[str | None, str | None]:
+        """Waits for a track selection started by `select_track_async`, up to its time budget."""
+        if deadline is None:
+            deadline = time.monotonic() + NAVIDROME_TIMEOUT
+        return self._join(future, deadline, (None, None), "Track selection")
+
+    def _join(self, future: Future, deadline: float, default: Any, label: str) -> Any:
+        """Returns a future's result, or `default` if it fails or misses its deadline."""
+        stage = label.lower().replace(" ", "_")
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except CancelledError:
+            pass  # the request it belonged to was cancelled
+        except FutureTimeoutError:
+            self.logger.warning(f"{label} timed out; continuing without it.")
+            metrics.increment(f"{stage}.timeouts")
+        except Exception as e:
+            self.logger.error(f"{label} failed: {e}")
+            metrics.increment(f"{stage}.errors")
+        return default
+
+    def shutdown(self):
+        """Stops background work (library sync, executor) and writes out pending profile changes."""
+        self._shutdown.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.user_profile.flush()
@@ -2,12 +2,22 @@ import shutil
 import subprocess
 import threading
 import time
+from collections import deque
 from typing import Optional, Callable
 from core.music_source_detector import MusicSourceDetector, MusicSource
+from core.mpv_ipc import MpvIpcClient
+from core.error_handler import AudioPlaybackError
+from core.metrics import metrics, timed
 
 class MusicAgent:
     """The Music Agent, responsible for playing local audio files and remote streams."""
 
+    # Properties the persistent mpv pushes to us instead of being polled.
+    # `idle-active` replaces the `idle` event, which newer mpv releases no longer send.
+    OBSERVED_PROPERTIES = ("time-pos", "duration", "pause", "eof-reached", "idle-active")
+    # The per-process players (ffplay/vlc) report nothing, so their position is estimated this often.
+    FALLBACK_POSITION_INTERVAL = 1.0
+
     def __init__(self, logger):
         """Initializes the Music Agent and finds a suitable player."""
         self.logger = logger
@@ -22,14 +32,25 @@ class MusicAgent:
         self.position = 0  # Current position in seconds
         self.duration = 0  # Track duration in seconds
         self.status_callback = None  # Callback for status updates
-        self._monitor_thread = None
-        self._stop_monitoring = False
+        self._playback_listeners = []  # Internal observers, e.g. the lookahead prefetcher
+        self._finish_notified = False  # "finished" is sent once per started item
+        self._stopped_process = None  # Fallback player process ended by stop(), not by finishing
+        self._track_started_at = None  # monotonic start of the current item, until its play time is recorded
+        self._play_queue = deque()  # (track_path, track_title) waiting to play
+        self._queue_lock = threading.Lock()
+        self._queue_thread = None
+        self.mpv = None  # Persistent mpv driven over JSON IPC, when mpv is the player
+        self._mpv_pending = deque()  # (track_path, track_title) loaded into mpv but not started yet
+        self._mpv_end_reason = None
+        self._player_start_at = None  # perf_counter when mpv was asked to start an item, until it plays
         self.source_detector = MusicSourceDetector(logger)
         if self.player_executable:
             self.logger.info(f"Music Agent: Using player '{self.player_executable}'.")
         else:
             self.logger.error("Music Agent: No supported music player found (mpv, ffplay, vlc).")
             raise RuntimeError("No supported music player found. Please install 'mpv', 'ffplay', or 'vlc'.")
+        if self.player_executable == "mpv":
+            self._start_mpv()
 
     def _find_player(self) -> str | None:
         """Finds the first available command-line music player."""
@@ -39,20 +60,58 @@ class MusicAgent:
                 return player
         return None
 
-    def play_track(self, track_path: str, track_title: str = None):
-        """Plays the given audio track, which can be a local file path or a URL."""
-        if self.process and self.process.poll() is None:
-            self.logger.warning("Another track is already playing. Stopping it first.")
-            self.stop()
+    def _start_mpv(self) -> bool:
+        """Starts the session's persistent mpv instance."""
+        try:
+            self.mpv = MpvIpcClient(
+                self.logger, self.player_executable,
+                extra_args=[f"--volume={self.volume}"],
+                event_callback=self._on_mpv_event,
+            )
+            self.mpv.start()
+            for observer_id, name in enumerate(self.OBSERVED_PROPERTIES, start=1):
+                self.mpv.observe_property(name, observer_id)
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to start persistent mpv ({e}); falling back to one player process per track.")
+            self.mpv = None
+            return False
 
-        if not self.player_executable:
-            self.logger.error("Cannot play track: No music player available.")
+    def _mpv_ready(self) -> bool:
+        """True if commands can go to the persistent mpv, restarting it if it died."""
+        if self.mpv is None:
             return False
-        
-        if not track_path:
-            self.logger.warning("No track path or URL provided to play.")
+        if self.mpv.is_alive():
+            return True
+        self.logger.warning("Persistent mpv is not running; restarting it.")
+        return self._start_mpv()
+
+    def _mpv_load(self, track_path: str, track_title: str | None, mode: str) -> bool:
+        """Loads an item into the persistent mpv (`replace` plays now, `append-play` queues it)."""
+        item = (track_path, track_title)
+        with self._queue_lock:
+            if mode == "replace":
+                self._mpv_pending.clear()
+            self._mpv_pending.append(item)
+        if mode == "replace" or not self.is_playing:
+            # Starts right away; `player_start` runs until mpv's playback-restart.
+            self._player_start_at = time.perf_counter()
+        try:
+            self.mpv.loadfile(track_path, mode)
+            return True
+        except AudioPlaybackError as e:
+            self.logger.error(f"Failed to load '{track_path}' into mpv: {e}")
+            self.source_detector.record_failure(track_path, self.player_executable)
+            self._player_start_at = None
+            metrics.increment("player_start.errors")
+            with self._queue_lock:
+                if item in self._mpv_pending:
+                    self._mpv_pending.remove(item)
             return False
 
+    def _on_track_started(self, track_path: str, track_title: str | None):
+        """Updates state and notifies observers when an item starts playing."""
+        self._record_play_time()
         self.current_track = track_path
         self.current_track_title = track_title or track_path
         
@@ -64,45 +123,114 @@ class MusicAgent:
         self.logger.info(f"Playing: {self.current_track_title}")
         self.logger.info(f"Source: {source_info}")
 
+        self.is_playing = True
+        self.is_paused = False
+        self.position = 0
+        self.duration = 0
+        self._finish_notified = False
+        self._track_started_at = time.monotonic()
+
+        if self.status_callback:
+            self.status_callback("playing", self.current_track_title)
+        self._notify_listeners("playing", track_path)
+
+    def play_track(self, track_path: str, track_title: str = None):
+        """Plays the given audio track, which can be a local file path or a URL."""
+        if not self.player_executable:
+            self.logger.error("Cannot play track: No music player available.")
+            return False
+        
+        if not track_path:
+            self.logger.warning("No track path or URL provided to play.")
+            return False
+
+        if self._mpv_ready():
+            # Replaces whatever is playing without restarting the player.
+            return self._mpv_load(track_path, track_title, "replace")
+
+        if self.process and self.process.poll() is None:
+            self.logger.warning("Another track is already playing. Stopping it first.")
+            self.stop()
+
         try:
-            # Use mpv with JSON IPC for better control if available
+            args = [self.player_executable, track_path]
             if self.player_executable == "mpv":
-                self.process = subprocess.Popen([
-                    self.player_executable, 
-                    track_path,
-                    "--no-video",
-                    f"--volume={self.volume}",
-                    "--input-ipc-server=/tmp/mpv-socket"
-                ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            else:
-                self.process = subprocess.Popen(
-                    [self.player_executable, track_path],
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL
-                )
-            
-            self.is_playing = True
-            self.is_paused = False
-            self.position = 0
+                args += ["--no-video", f"--volume={self.volume}"]
+            # The per-process players give no start signal; launching them is the best measure.
+            with timed("player_start"):
+                self.process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self._on_track_started(track_path, track_title)
             
-            # Start monitoring thread
-            self._start_monitoring()
-            
-            if self.status_callback:
-                self.status_callback("playing", self.current_track_title)
+            # Waits on the process, estimating its position in between.
+            threading.Thread(target=self._wait_for_exit, args=(self.process, track_path), daemon=True).start()
                 
             return True
             
         except Exception as e:
             self.logger.error(f"Failed to play '{track_path}': {e}", exc_info=True)
+            self.source_detector.record_failure(track_path, self.player_executable)
             return False
 
+    def enqueue_track(self, track_path: str, track_title: str = None):
+        """Queues a track to play once everything queued before it has finished."""
+        if not track_path:
+            self.logger.warning("No track path or URL provided to enqueue.")
+            return
+        if self._mpv_ready():
+            # mpv queues it in its own playlist and transitions gaplessly.
+            self._mpv_load(track_path, track_title, "append-play")
+            return
+        with self._queue_lock:
+            self._play_queue.append((track_path, track_title))
+            if not self._queue_thread or not self._queue_thread.is_alive():
+                self._queue_thread = threading.Thread(target=self._drain_queue, daemon=True)
+                self._queue_thread.start()
+
+    def _drain_queue(self):
+        """Plays queued items back to back until the queue is empty."""
+        while True:
+            with self._queue_lock:
+                if not self._play_queue:
+                    self._queue_thread = None
+                    return
+                track_path, track_title = self._play_queue.popleft()
+
+            if self.play_track(track_path, track_title):
+                process = self.process
+                if process:
+                    process.wait()
+
+    def has_queued_tracks(self) -> bool:
+        """True if anything is waiting in the playback queue."""
+        with self._queue_lock:
+            return bool(self._play_queue or self._mpv_pending)
+
+    def clear_queue(self):
+        """Drops everything waiting in the playback queue."""
+        with self._queue_lock:
+            self._play_queue.clear()
+            self._mpv_pending.clear()
+        if self.mpv and self.mpv.is_alive():
+            try:
+                self.mpv.command("playlist-clear")  # keeps the current item
+            except AudioPlaybackError as e:
+                self.logger.error(f"Failed to clear mpv playlist: {e}")
+
     def stop(self):
-        """Stops the currently playing track."""
-        self._stop_monitoring = True
+        """Stops the currently playing track and clears the playback queue."""
+        with self._queue_lock:
+            self._play_queue.clear()
+            self._mpv_pending.clear()
         
-        if self.process and self.process.poll() is None: # Check if process is running
+        if self.mpv and self.mpv.is_alive():
+            try:
+                self.mpv.stop()  # clears mpv's playlist; the player itself stays up
+                self.logger.info("Music player stopped.")
+            except AudioPlaybackError as e:
+                self.logger.error(f"Failed to stop mpv: {e}")
+        elif self.process and self.process.poll() is None: # Check if process is running
             self.logger.info("Stopping music player...")
+            self._stopped_process = self.process
             self.process.terminate()
             self.process.wait() # Wait for the process to terminate
             self.logger.info("Music player stopped.")
@@ -110,6 +238,7 @@ class MusicAgent:
         else:
             self.logger.info("No music is currently playing.")
             
+        self._record_play_time()
         self.is_playing = False
         self.is_paused = False
         self.current_track = None
@@ -119,23 +248,21 @@ class MusicAgent:
         
         if self.status_callback:
             self.status_callback("stopped", None)
+        self._notify_listeners("stopped", None)
     
     def pause(self):
         """Pause the currently playing track."""
         if not self.is_playing or self.is_paused:
             return False
             
-        if self.player_executable == "mpv" and self.process:
+        if self._mpv_ready():
             try:
-                # Send pause command to mpv via IPC (simplified)
-                self.is_paused = True
-                if self.status_callback:
-                    self.status_callback("paused", self.current_track_title)
-                return True
-            except:
-                pass
+                self.mpv.set_property("pause", True)
+                return True  # state and callback follow from the `pause` property change
+            except AudioPlaybackError as e:
+                self.logger.error(f"Failed to pause mpv: {e}")
+                return False
         
-        # Fallback: stop and remember position for resume
         self.is_paused = True
         if self.status_callback:
             self.status_callback("paused", self.current_track_title)
@@ -147,6 +274,13 @@ class MusicAgent:
             return False
             
         if self.current_track:
+            if self._mpv_ready():
+                try:
+                    self.mpv.set_property("pause", False)
+                    return True
+                except AudioPlaybackError as e:
+                    self.logger.error(f"Failed to resume mpv: {e}")
+                    return False
             self.is_paused = False
             if self.status_callback:
                 self.status_callback("playing", self.current_track_title)
@@ -157,17 +291,37 @@ class MusicAgent:
         """Set playback volume (0-100)."""
         self.volume = max(0, min(100, volume))
         
-        if self.player_executable == "mpv" and self.process and self.process.poll() is None:
+        if self._mpv_ready():
             try:
-                # Send volume command to mpv (simplified)
-                pass
-            except:
-                pass
+                self.mpv.set_property("volume", self.volume)
+            except AudioPlaybackError as e:
+                self.logger.error(f"Failed to set mpv volume: {e}")
         
         if self.status_callback:
             self.status_callback("volume_changed", self.volume)
         
         return self.volume
+
+    def seek(self, position: float) -> bool:
+        """Seek to an absolute position (seconds) in the current track."""
+        if not self.is_playing:
+            return False
+        if not self._mpv_ready():
+            self.logger.info("Seeking is only supported with the persistent mpv player.")
+            return False
+        try:
+            self.mpv.seek(position)
+            return True
+        except AudioPlaybackError as e:
+            self.logger.error(f"Failed to seek: {e}")
+            return False
+
+    def shutdown(self):
+        """Stops playback and closes the persistent player."""
+        self.stop()
+        if self.mpv:
+            self.mpv.close()
+            self.mpv = None
     
     def get_status(self):
         """Get current playback status."""
@@ -195,29 +349,134 @@ class MusicAgent:
     def set_status_callback(self, callback: Callable):
         """Set callback function for status updates."""
         self.status_callback = callback
+
+    def add_playback_listener(self, listener: Callable[[str, object], None]):
+        """
+        Registers an observer for playback lifecycle events: ("playing", path),
+        ("position", seconds), ("finished", path) and ("stopped", None).
+        Events are delivered on a background thread.
+        """
+        self._playback_listeners.append(listener)
+
+    def _notify_listeners(self, event: str, data):
+        """Sends a playback event to every registered listener."""
+        for listener in self._playback_listeners:
+            try:
+                listener(event, data)
+            except Exception as e:
+                self.logger.error(f"Playback listener failed on '{event}': {e}", exc_info=True)
     
-    def _start_monitoring(self):
-        """Start monitoring thread for playback status."""
-        self._stop_monitoring = False
-        self._monitor_thread = threading.Thread(target=self._monitor_playback, daemon=True)
-        self._monitor_thread.start()
-    
-    def _monitor_playback(self):
-        """Monitor playback status in background thread."""
-        while not self._stop_monitoring and self.process:
-            if self.process.poll() is not None:
-                # Process ended
+    def _wait_for_exit(self, process, track_path):
+        """
+        Reports the end of a per-process track (ffplay/vlc fallback). Until then the
+        position is estimated from wall time, so the lookahead prefetch still triggers.
+        """
+        started = time.monotonic()
+        while True:
+            try:
+                process.wait(timeout=self.FALLBACK_POSITION_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if process is self.process:
+                    self._report_position(time.monotonic() - started)
+        if process is self._stopped_process:
+            return
+        self._notify_listeners("finished", track_path)
+        if process is self.process:
+            self._record_play_time()
+            self.is_playing = False
+            self.is_paused = False
+            if self.status_callback:
+                self.status_callback("finished", None)
+
+    def _on_track_finished(self, track_path):
+        """Tells listeners the current item played to the end (once per item)."""
+        if self._finish_notified:
+            return
+        self._finish_notified = True
+        self._record_play_time()
+        self._notify_listeners("finished", track_path)
+
+    def _record_play_time(self):
+        """Credits the current item's listening time to its source (once per item)."""
+        started, self._track_started_at = self._track_started_at, None
+        if started is None or not self.current_track:
+            return
+        # mpv reports the real position; the per-process fallback only knows wall time.
+        played = self.position if self.mpv else time.monotonic() - started
+        self.source_detector.record_play_time(self.current_track, played)
+
+    def _on_mpv_event(self, event: dict):
+        """Applies state pushed by the persistent mpv (runs on the IPC reader thread)."""
+        name = event.get("event")
+        if name == "property-change":
+            self._on_mpv_property(event.get("name"), event.get("data"))
+        elif name == "start-file":
+            if self._player_start_at is None:
+                # A queued item: mpv starts it on its own once the one before it ends.
+                self._player_start_at = time.perf_counter()
+            with self._queue_lock:
+                item = self._mpv_pending.popleft() if self._mpv_pending else None
+            if item:
+                self._on_track_started(*item)
+        elif name == "playback-restart":
+            # Also sent after seeks; only the first one after a start counts.
+            started, self._player_start_at = self._player_start_at, None
+            if started is not None:
+                metrics.record("player_start", time.perf_counter() - started)
+        elif name == "end-file":
+            self._mpv_end_reason = event.get("reason")
+            if self._mpv_end_reason == "eof":
+                self._on_track_finished(self.current_track)
+            elif self._mpv_end_reason == "error":
+                self.logger.error(f"mpv failed to play '{self.current_track}': {event.get('file_error')}")
+                if self._player_start_at is not None:
+                    self._player_start_at = None
+                    metrics.increment("player_start.errors")
+                self.source_detector.record_failure(self.current_track, self.player_executable)
+        elif name == "disconnected":
+            self.is_playing = False
+            self.is_paused = False
+
+    def _on_mpv_property(self, name: str, value):
+        """Handles one observed property change."""
+        if name == "time-pos":
+            self._report_position(value or 0)
+        elif name == "duration":
+            self.duration = value or 0
+            if self.status_callback:
+                self.status_callback("duration", self.duration)
+        elif name == "pause":
+            paused = bool(value)
+            if paused == self.is_paused or not self.is_playing:
+                return
+            self.is_paused = paused
+            if self.status_callback:
+                self.status_callback("paused" if paused else "playing", self.current_track_title)
+        elif name == "eof-reached":
+            if value:
+                self._on_track_finished(self.current_track)
+        elif name == "idle-active":
+            if not value:
+                return
+            # The playlist ran out; only report it if the last item ended on its own.
+            if self._mpv_end_reason in ("eof", "error") and not self.has_queued_tracks():
                 self.is_playing = False
                 self.is_paused = False
                 if self.status_callback:
                     self.status_callback("finished", None)
-                break
-            
-            if self.is_playing and not self.is_paused:
-                self.position += 1
-            
-            time.sleep(1)
-    
+            self._mpv_end_reason = None
+
+    def _report_position(self, position: float):
+        """Stores the position; listeners hear about it once per whole second (or seek)."""
+        # time-pos changes many times a second; only whole seconds (or seeks) are reported.
+        report = int(position) != int(self.position)
+        self.position = position
+        if report and self.is_playing:
+            self._notify_listeners("position", position)
+            if self.status_callback:
+                self.status_callback("position", position)
+
     def get_source_info(self) -> str:
         """Get formatted information about the current music source."""
         if self.current_source:
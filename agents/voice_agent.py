@@ -1,22 +1,33 @@
 """
 VoiceAgent: sends text to ElevenLabs TTS and returns a local mp3 path.
+Rendered clips are reused from the on-disk TTS cache.
 If the API key is missing, it falls back to printing the text to the console.
 """
+import functools
 import os
 import platform
 import requests
 import shutil
-import uuid
-import tempfile
-import pyttsx3
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
 
 from dotenv import load_dotenv
+from core.tts_cache import TTSCache
+from core.audio_fifo import StreamingAudioTee, fifo_supported
+from core.http_transport import get_transport
+from core.tts_worker import LocalTTSPool
+from core.metrics import metrics, timed
 load_dotenv()
 
 ELEVEN_API_KEY = os.getenv("ELEVEN_API_KEY")
 RACHEL_VOICE_ID = os.getenv("ELEVEN_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")  # Default voice is 'Rachel' from ElevenLabs
+ELEVEN_MODEL_ID = os.getenv("ELEVEN_MODEL_ID", "eleven_multilingual_v2")
+# Pipe ElevenLabs audio into the player as it streams in (POSIX only).
+ELEVEN_STREAMING = os.getenv("ELEVEN_STREAMING", "true").lower() in ("1", "true", "yes")
 
 ENDPOINT = f"https://api.elevenlabs.io/v1/text-to-speech/{RACHEL_VOICE_ID}"
+STREAM_ENDPOINT = f"{ENDPOINT}/stream"
 
 class VoiceAgent:
     """The Voice agent, responsible for text-to-speech."""
@@ -24,38 +35,60 @@ class VoiceAgent:
     def __init__(self, logger):
         """Initializes the Voice agent."""
         self.logger = logger
-        self.tts_engine = None
+        self.local_tts = None  # Worker processes that own the pyttsx3 engines
+        self.tts_cache = TTSCache(logger)
+        self.transport = get_transport(logger)
+        self.transport.label_host(ENDPOINT, "elevenlabs")
+        # Runs speak() for speak_async(); local renders additionally go to the process pool.
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="voice-agent")
+        self._async_jobs = set()
+        self._jobs_lock = threading.Lock()
         if not ELEVEN_API_KEY:
             self.logger.warning("ElevenLabs API key not found. Attempting to initialize local TTS fallback.")
             try:
                 # On non-Windows systems, espeak-ng is required for pyttsx3 to work.
                 if platform.system() != "Windows" and not shutil.which("espeak-ng"):
                     raise RuntimeError("Local TTS fallback requires 'espeak-ng'. Please install it (e.g., 'sudo apt install espeak-ng').")
-                self.tts_engine = pyttsx3.init()
+                self.local_tts = LocalTTSPool(logger)
+                self.local_tts.start()
                 self.logger.info("Local TTS engine initialized successfully.")
             except Exception as e:
                 self.logger.error(f"Failed to initialize local TTS engine: {e}")
-                self.tts_engine = None
+                self.local_tts = None
         else:
             self.logger.info("Voice Agent: Initialized with ElevenLabs API.")
 
-    def speak(self, text: str) -> str | None:
+    @timed("tts_speak")
+    def speak(self, text: str, stream: bool = False) -> str | None:
         """
         Generates audio from text using the ElevenLabs API and returns the audio file path.
+        With `stream=True` (ElevenLabs on POSIX), returns a FIFO the player can read while
+        the audio is still arriving; the finished clip still lands in the TTS cache.
         If the API key is missing, it prints the commentary to the console and returns an empty string.
         """
         if not ELEVEN_API_KEY:
-            if self.tts_engine:
+            if self.local_tts:
                 return self._speak_local(text)
             else:
                 self.logger.error("Local TTS engine not available. Falling back to console output.")
                 print(f"\n--- DJ Commentary ---\n{text}\n---------------------")
                 return None
 
+        cache_key = TTSCache.make_key(text, RACHEL_VOICE_ID, ELEVEN_MODEL_ID, "elevenlabs")
+        cached_path = self.tts_cache.get(cache_key)
+        if cached_path:
+            self.logger.info(f"TTS cache hit for: '{text}'")
+            return cached_path
+
+        if stream and ELEVEN_STREAMING and fifo_supported():
+            fifo_path = self._speak_streamed(text, cache_key)
+            if fifo_path:
+                return fifo_path
+
         try:
             payload = {
                 "text": text,
-                "model_id": "eleven_multilingual_v2"
+                "model_id": ELEVEN_MODEL_ID
             }
             headers = {
                 "xi-api-key": ELEVEN_API_KEY,
@@ -63,14 +96,10 @@ class VoiceAgent:
                 "Accept": "audio/mpeg",
             }
             self.logger.info(f"Requesting TTS for: '{text}'")
-            response = requests.post(ENDPOINT, json=payload, headers=headers, timeout=30)
+            response = self.transport.post(ENDPOINT, json=payload, headers=headers)
             response.raise_for_status()
 
-            # Save the audio to a temporary file
-            temp_dir = tempfile.gettempdir()
-            output_path = os.path.join(temp_dir, f"{uuid.uuid4()}.mp3")
-            with open(output_path, "wb") as f:
-                f.write(response.content)
+            output_path = self.tts_cache.put_bytes(cache_key, response.content)
             
             print(f"Voice Agent: Commentary saved to {output_path}")
             return output_path
@@ -79,16 +108,140 @@ class VoiceAgent:
             self.logger.info("Falling back to local TTS.")
             return self._speak_local(text)
 
+    def _speak_streamed(self, text: str, cache_key: str) -> str | None:
+        """Starts a streamed ElevenLabs request and returns a FIFO fed as chunks arrive."""
+        payload = {"text": text, "model_id": ELEVEN_MODEL_ID}
+        headers = {
+            "xi-api-key": ELEVEN_API_KEY,
+            "Content-Type": "application/json",
+            "Accept": "audio/mpeg",
+        }
+        try:
+            self.logger.info(f"Requesting streamed TTS for: '{text}'")
+            response = self.transport.post(STREAM_ENDPOINT, json=payload, headers=headers, stream=True)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Error calling ElevenLabs streaming API: {e}")
+            return None
+
+        def _chunks():
+            try:
+                yield from response.iter_content(chunk_size=4096)
+            finally:
+                response.close()
+
+        tee = StreamingAudioTee(
+            self.logger,
+            self.tts_cache.temp_path(),
+            on_complete=lambda path: self.tts_cache.put_file(cache_key, path),
+        )
+        try:
+            return tee.start(_chunks())
+        except OSError as e:
+            self.logger.error(f"Could not set up streamed playback: {e}")
+            response.close()
+            return None
+
+    def speak_async(self, text: str, stream: bool = False) -> Future:
+        """
+        Like `speak`, but returns a future right away so several sentences can render
+        in parallel. Jobs that haven't started can be dropped with `cancel_pending`.
+        """
+        if not ELEVEN_API_KEY and self.local_tts:
+            # Goes straight to the worker pool, bypassing the timed speak().
+            future = self._speak_local_async(text)
+            future.add_done_callback(functools.partial(self._record_local_render, time.perf_counter()))
+        else:
+            future = self.executor.submit(self.speak, text, stream)
+        with self._jobs_lock:
+            self._async_jobs.add(future)
+        future.add_done_callback(self._forget_job)
+        return future
+
+    def cancel_pending(self) -> int:
+        """Cancels queued speak_async jobs (e.g. commentary for a vibe that was replaced)."""
+        with self._jobs_lock:
+            jobs = list(self._async_jobs)
+        cancelled = sum(1 for job in jobs if job.cancel())
+        if cancelled:
+            self.logger.info(f"Voice Agent: cancelled {cancelled} stale TTS job(s).")
+        return cancelled
+
+    def shutdown(self):
+        """Stops the TTS workers."""
+        self.cancel_pending()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.local_tts:
+            self.local_tts.shutdown()
+
+    @staticmethod
+    def _record_local_render(started: float, future: Future):
+        """Records an async local render in the same `tts_speak` histogram as speak()."""
+        if future.cancelled():
+            return
+        metrics.record("tts_speak", time.perf_counter() - started)
+        if future.result() is None:
+            metrics.increment("tts_speak.errors")
+
+    def _forget_job(self, future: Future):
+        with self._jobs_lock:
+            self._async_jobs.discard(future)
+
+    def _local_cache_key(self, text: str) -> str:
+        return TTSCache.make_key(text, self.local_tts.voice_id, self.local_tts.rate, "pyttsx3")
+
     def _speak_local(self, text: str) -> str | None:
         """Generates audio from text using the local TTS engine."""
+        if not self.local_tts:
+            self.logger.error("Local TTS engine not available.")
+            return None
         try:
-            self.logger.info(f"Generating local TTS for: '{text}'")
-            temp_dir = tempfile.gettempdir()
-            output_path = os.path.join(temp_dir, f"{uuid.uuid4()}.mp3")
-            self.tts_engine.save_to_file(text, output_path)
-            self.tts_engine.runAndWait()
-            self.logger.info(f"Local TTS audio saved to {output_path}")
-            return output_path
-        except Exception as e:
-            self.logger.error(f"Failed to generate local TTS audio: {e}")
+            return self._speak_local_async(text).result()
+        except Exception:
             return None
+
+    def _speak_local_async(self, text: str) -> Future:
+        """Queues a local render on the worker pool; resolves to the cached clip path (or None)."""
+        result = Future()
+        cache_key = self._local_cache_key(text)
+        cached_path = self.tts_cache.get(cache_key)
+        if cached_path:
+            self.logger.info(f"TTS cache hit for: '{text}'")
+            result.set_result(cached_path)
+            return result
+
+        temp_path = self.tts_cache.temp_path()
+        self.logger.info(f"Generating local TTS for: '{text}'")
+        try:
+            job = self.local_tts.submit(text, temp_path)
+        except Exception as e:
+            self.logger.error(f"Failed to queue local TTS job: {e}")
+            result.set_result(None)
+            return result
+
+        def _on_rendered(job: Future):
+            if job.cancelled():
+                result.cancel()
+                return
+            output_path = None
+            try:
+                job.result()
+                # Cached even if the caller gave up on it meanwhile.
+                output_path = self.tts_cache.put_file(cache_key, temp_path)
+                self.logger.info(f"Local TTS audio saved to {output_path}")
+            except Exception as e:
+                self.logger.error(f"Failed to generate local TTS audio: {e}")
+                self.tts_cache.discard_temp(temp_path)
+            try:
+                result.set_result(output_path)
+            except InvalidStateError:
+                pass  # cancelled while rendering
+
+        def _on_result_done(result: Future):
+            # Cancelling the returned future cancels the render if it hasn't started.
+            if result.cancelled():
+                job.cancel()
+
+        result.add_done_callback(_on_result_done)
+        job.add_done_callback(_on_rendered)
+        return result
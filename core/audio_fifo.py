@@ -0,0 +1,135 @@
+"""
+Streaming Audio FIFO for Personal DJ
+
+Lets the player start on a TTS clip while it is still being downloaded:
+- Chunks from a streaming HTTP response are written to a file on disk
+- A named pipe (FIFO) is handed to the player immediately
+- A feeder thread tails the file into the FIFO as soon as the player opens it
+- The complete file is kept afterwards, e.g. for the TTS cache
+
+FIFOs are POSIX-only; callers fall back to a full download on Windows.
+"""
+
+import errno
+import os
+import platform
+import tempfile
+import threading
+import time
+import uuid
+from typing import Callable, Iterable, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# How long to wait for the player to reach a queued clip before giving up on feeding it.
+FIFO_OPEN_TIMEOUT = float(os.getenv("TTS_STREAM_OPEN_TIMEOUT", "120"))
+
+CHUNK_SIZE = 16 * 1024
+
+
+def fifo_supported() -> bool:
+    return platform.system() != "Windows" and hasattr(os, "mkfifo")
+
+
+class StreamingAudioTee:
+    """Copies one streamed clip into a file on disk and, as it arrives, into a FIFO for the player."""
+
+    def __init__(self, logger, file_path: str, on_complete: Optional[Callable[[str], None]] = None,
+                 open_timeout: float = None):
+        self.logger = logger
+        self.file_path = file_path
+        self.on_complete = on_complete
+        self.open_timeout = open_timeout if open_timeout is not None else FIFO_OPEN_TIMEOUT
+        self.fifo_path = os.path.join(tempfile.gettempdir(), f"personal-dj-tts-{uuid.uuid4().hex}.fifo")
+
+        self._cond = threading.Condition()
+        self._written = 0
+        self._done = False
+        self._failed = False
+
+    def start(self, chunks: Iterable[bytes]) -> str:
+        """Starts downloading and feeding in the background; returns the FIFO path for the player."""
+        os.mkfifo(self.fifo_path)
+        # Opened before the download starts so the feeder can follow the file even after it's renamed.
+        open(self.file_path, "wb").close()
+        reader = open(self.file_path, "rb")
+        threading.Thread(target=self._download, args=(chunks,), name="tts-stream-download", daemon=True).start()
+        threading.Thread(target=self._feed, args=(reader,), name="tts-stream-feed", daemon=True).start()
+        return self.fifo_path
+
+    def _download(self, chunks: Iterable[bytes]):
+        try:
+            with open(self.file_path, "ab") as f:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    f.write(chunk)
+                    f.flush()
+                    with self._cond:
+                        self._written += len(chunk)
+                        self._cond.notify_all()
+        except Exception as e:
+            self.logger.error(f"Streaming TTS download failed: {e}")
+            self._failed = True
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+        if self._failed or not self._written:
+            try:
+                os.remove(self.file_path)
+            except OSError:
+                pass
+        elif self.on_complete:
+            try:
+                self.on_complete(self.file_path)
+            except Exception as e:
+                self.logger.error(f"Failed to keep streamed TTS clip: {e}")
+
+    def _feed(self, reader):
+        """Tails the downloaded file into the FIFO once the player opens it."""
+        fd = None
+        try:
+            fd = self._open_fifo()
+            if fd is None:
+                self.logger.info("Streaming TTS: player never reached the clip; not feeding it.")
+                return
+            while True:
+                data = reader.read(CHUNK_SIZE)
+                if data:
+                    os.write(fd, data)
+                    continue
+                with self._cond:
+                    if self._done and reader.tell() >= self._written:
+                        return
+                    self._cond.wait(timeout=1)
+        except BrokenPipeError:
+            pass  # the player stopped reading (skip/stop)
+        except OSError as e:
+            self.logger.error(f"Streaming TTS: failed to feed the player: {e}")
+        finally:
+            reader.close()
+            if fd is not None:
+                os.close(fd)
+            try:
+                os.unlink(self.fifo_path)
+            except OSError:
+                pass
+
+    def _open_fifo(self) -> Optional[int]:
+        """Waits for a reader on the FIFO without blocking forever if the clip is dropped."""
+        deadline = time.monotonic() + self.open_timeout
+        while time.monotonic() < deadline:
+            try:
+                fd = os.open(self.fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as e:
+                if e.errno != errno.ENXIO:  # ENXIO: no reader yet
+                    raise
+                time.sleep(0.05)
+                continue
+            os.set_blocking(fd, True)
+            return fd
+        return None
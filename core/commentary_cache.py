@@ -0,0 +1,212 @@
+"""
+Commentary Cache for Personal DJ
+
+Users repeat the same vibes constantly, so generated commentary is cached:
+- Keyed by a normalized vibe plus a fingerprint of the profile prompt context
+- LRU eviction with a per-variant TTL
+- Several variants per key, one picked at random so repeats still feel fresh
+- Optional on-disk SQLite persistence across restarts
+- Hit/miss/eviction counters
+"""
+
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+COMMENTARY_CACHE_SIZE = int(os.getenv("COMMENTARY_CACHE_SIZE", "256"))
+COMMENTARY_CACHE_TTL = float(os.getenv("COMMENTARY_CACHE_TTL", "86400"))  # seconds
+COMMENTARY_CACHE_VARIANTS = int(os.getenv("COMMENTARY_CACHE_VARIANTS", "3"))
+COMMENTARY_CACHE_DB = os.getenv("COMMENTARY_CACHE_DB", "")  # empty = in-memory only
+
+
+@dataclass
+class CachedVariant:
+    """One generated commentary for a cache key."""
+    text: str
+    created: float
+
+
+@dataclass
+class CommentaryCacheEntry:
+    """All cached variants for a normalized vibe + profile fingerprint."""
+    variants: List[CachedVariant] = field(default_factory=list)
+
+
+class CommentaryCache:
+    """LRU + TTL cache of generated DJ commentary."""
+
+    def __init__(self, logger, max_entries: int = None, ttl_seconds: float = None,
+                 max_variants: int = None, db_path: str = None):
+        self.logger = logger
+        self.max_entries = max_entries or COMMENTARY_CACHE_SIZE
+        self.ttl_seconds = ttl_seconds or COMMENTARY_CACHE_TTL
+        self.max_variants = max_variants or COMMENTARY_CACHE_VARIANTS
+        self._entries: "OrderedDict[str, CommentaryCacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        db_path = db_path if db_path is not None else COMMENTARY_CACHE_DB
+        if db_path:
+            self._open_db(db_path)
+
+    @staticmethod
+    def normalize_vibe(vibe: str) -> str:
+        """Lowercases and strips punctuation/extra whitespace so trivial variations share a key."""
+        words = re.findall(r"[\w']+", vibe.lower())
+        return " ".join(words)
+
+    @classmethod
+    def make_key(cls, vibe: str, profile_context: str) -> str:
+        """Builds the cache key from the vibe and a hash of the profile prompt context."""
+        fingerprint = hashlib.sha1(profile_context.encode("utf-8")).hexdigest()[:16]
+        return f"{cls.normalize_vibe(vibe)}|{fingerprint}"
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns a random fresh variant for the key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._drop_expired(key, entry)
+                entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return random.choice(entry.variants).text
+
+    def variant_count(self, key: str) -> int:
+        """Number of variants currently cached for a key."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return len(entry.variants) if entry else 0
+
+    def needs_variants(self, key: str) -> bool:
+        """True if the key has room for more variants."""
+        return self.variant_count(key) < self.max_variants
+
+    def put(self, key: str, text: str):
+        """Adds a commentary variant for the key, evicting the least recently used keys if needed."""
+        text = text.strip()
+        if not text:
+            return
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = CommentaryCacheEntry()
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+
+            if any(v.text == text for v in entry.variants):
+                return
+            entry.variants.append(CachedVariant(text=text, created=now))
+            dropped = []
+            while len(entry.variants) > self.max_variants:
+                dropped.append(entry.variants.pop(0))
+
+            evicted_keys = []
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                evicted_keys.append(evicted_key)
+                self.evictions += 1
+
+            self._persist_put(key, text, now, dropped, evicted_keys)
+
+    def clear(self):
+        """Empties the cache (and its on-disk copy)."""
+        with self._lock:
+            self._entries.clear()
+            if self._db:
+                self._db.execute("DELETE FROM commentary_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Returns cache counters for display and monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def _drop_expired(self, key: str, entry: CommentaryCacheEntry):
+        """Removes variants older than the TTL; drops the key if none remain. Caller holds the lock."""
+        cutoff = time.time() - self.ttl_seconds
+        fresh = [v for v in entry.variants if v.created >= cutoff]
+        if len(fresh) == len(entry.variants):
+            return
+        entry.variants = fresh
+        if self._db:
+            self._db.execute("DELETE FROM commentary_cache WHERE key = ? AND created < ?", (key, cutoff))
+            self._db.commit()
+        if not fresh:
+            del self._entries[key]
+            self.evictions += 1
+
+    # --- SQLite persistence ---
+
+    def _open_db(self, db_path: str):
+        """Opens the on-disk cache and loads its fresh entries."""
+        try:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS commentary_cache ("
+                "key TEXT NOT NULL, text TEXT NOT NULL, created REAL NOT NULL, "
+                "PRIMARY KEY (key, text))"
+            )
+            cutoff = time.time() - self.ttl_seconds
+            self._db.execute("DELETE FROM commentary_cache WHERE created < ?", (cutoff,))
+            self._db.commit()
+
+            rows = self._db.execute(
+                "SELECT key, text, created FROM commentary_cache ORDER BY created"
+            ).fetchall()
+            for key, text, created in rows:
+                entry = self._entries.setdefault(key, CommentaryCacheEntry())
+                entry.variants.append(CachedVariant(text=text, created=created))
+                entry.variants = entry.variants[-self.max_variants:]
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.logger.info(f"Commentary cache: loaded {len(self._entries)} entries from {db_path}")
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to open commentary cache database '{db_path}': {e}")
+            self._db = None
+
+    def _persist_put(self, key: str, text: str, created: float,
+                     dropped: List[CachedVariant], evicted_keys: List[str]):
+        """Mirrors a put into SQLite. Caller holds the lock."""
+        if not self._db:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO commentary_cache (key, text, created) VALUES (?, ?, ?)",
+                (key, text, created),
+            )
+            for variant in dropped:
+                self._db.execute("DELETE FROM commentary_cache WHERE key = ? AND text = ?", (key, variant.text))
+            for evicted_key in evicted_keys:
+                self._db.execute("DELETE FROM commentary_cache WHERE key = ?", (evicted_key,))
+            self._db.commit()
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to persist commentary cache entry: {e}")
@@ -1,6 +1,12 @@
+from typing import Callable, Optional
+
 from agents.dj_agent import DJAgent
 from agents.music_agent import MusicAgent
 from agents.voice_agent import VoiceAgent
+from core.pipeline import DJPipeline, PipelineRequest
+from core.prefetcher import LookaheadPrefetcher, PrefetchedTransition
+from core.phrase_warmup import PhraseWarmup
+
 
 class Dispatcher:
     """Coordinates the AI agents to create the Personal DJ experience."""
@@ -13,6 +19,74 @@ class Dispatcher:
         self.dj_agent = DJAgent(self.logger)
         self.music_agent = MusicAgent(self.logger)
         self.voice_agent = VoiceAgent(self.logger)
+        self.prefetcher = LookaheadPrefetcher(self.logger, self.dj_agent, self.voice_agent, self.music_agent)
+        # Render the DJ's intro and catchphrases now so the session opener is instant.
+        self.phrase_warmup = PhraseWarmup(self.logger, self.dj_agent.user_profile, self.voice_agent)
+        self.phrase_warmup.start()
+        self._intro_played = False
+        # Every front-end (this loop, the CLI and the GUI worker) drives requests through it.
+        self.pipeline = DJPipeline(self.logger, self)
+
+    def submit(self, vibe: str, on_event: Optional[Callable[[str, object], None]] = None) -> PipelineRequest:
+        """Starts a DJ request for a vibe without blocking; see `DJPipeline.submit`."""
+        return self.pipeline.submit(vibe, on_event)
+
+    def stop(self):
+        """Cancels requests in flight and stops playback."""
+        self.pipeline.cancel_all()
+        self.music_agent.stop()
+
+    def play_intro(self) -> bool:
+        """
+        Replaces playback with the pre-rendered session opener on the first vibe, if it's ready.
+        Only the first vibe gets a chance: an opener rendered later is skipped, not played mid-session.
+        """
+        if self._intro_played:
+            return False
+        self._intro_played = True
+        intro_path = self.phrase_warmup.intro_clip()
+        if not intro_path:
+            self.logger.info("Session opener not rendered yet; skipping it.")
+            return False
+        self.music_agent.stop()
+        self.music_agent.enqueue_track(intro_path)
+        return True
+
+    def queue_commentary(self, audio_path: str, replace: bool = False):
+        """Queues a commentary clip; `replace` stops whatever was playing first."""
+        if replace:
+            self.music_agent.stop()
+        self.music_agent.enqueue_track(audio_path)
+
+    def play_prefetched(self, vibe: str) -> Optional[PrefetchedTransition]:
+        """Plays the lookahead bundle for this vibe right away, if one is ready."""
+        self.prefetcher.set_vibe(vibe)
+        bundle = self.prefetcher.take(vibe)
+        if bundle is None or not bundle.track_url:
+            return None
+        self.logger.info(f"Using prefetched transition for '{vibe}'.")
+        self.prefetcher.play(bundle)
+        return bundle
+
+    def queue_track(self, track_title: Optional[str], track_url: str):
+        """Queues the vibe's track after its commentary and starts the lookahead watch on it."""
+        self.music_agent.enqueue_track(track_url, track_title)
+        self.prefetcher.watch(track_url)
+
+    def skip(self) -> Optional[PrefetchedTransition]:
+        """Skips to the prefetched next transition, or just stops if none is ready."""
+        bundle = self.prefetcher.advance()
+        if bundle is None:
+            self.music_agent.stop()
+        return bundle
+
+    def shutdown(self):
+        """Stops playback and background work before the application exits."""
+        self.pipeline.shutdown()
+        self.prefetcher.shutdown()
+        self.music_agent.shutdown()
+        self.voice_agent.shutdown()
+        self.dj_agent.shutdown()
 
     def start(self):
         """Starts the main application loop."""
@@ -24,25 +98,16 @@ class Dispatcher:
                 if vibe.lower() == 'quit':
                     break
 
-                self.logger.info(f"Vibe received: '{vibe}'. Engaging agents...")
-                
-                # 1. DJ Agent generates commentary and selects a music track.
-                commentary, track_title, track_url = self.dj_agent.respond(vibe)
-                
-                # 2. Voice Agent turns the commentary into speech.
-                commentary_audio_path = self.voice_agent.speak(commentary)
-
-                # 3. Music Agent plays the commentary, then the music.
-                if commentary_audio_path:
-                    self.music_agent.play_track(commentary_audio_path)
-                
-                if track_url:
-                    self.music_agent.play_track(track_url)
-                else:
-                    self.logger.warning("No music track was selected by the DJ Agent.")
+                # Runs in the background; a new vibe cancels this one if it's still in flight.
+                self.submit(vibe, on_event=self._log_event)
 
             except Exception as e:
                 self.logger.error(f"An error occurred in the main loop: {e}", exc_info=True)
                 # The loop continues, making the app more resilient.
 
+        self.shutdown()
         self.logger.info("Dispatcher loop ended.")
+
+    def _log_event(self, event: str, data):
+        if event == "now_playing":
+            self.logger.info(f"Now playing: {data}")
@@ -0,0 +1,206 @@
+"""
+Shared HTTP Transport for Personal DJ
+
+One place for every outbound HTTP call (ElevenLabs, Navidrome, Ollama):
+- A pooled keep-alive `requests.Session` per host, so TCP/TLS handshakes are reused
+- Bounded concurrency per host
+- Jittered exponential retry on 429/5xx (honoring `Retry-After`) and connection errors;
+  POSTs, which may already have been processed, only on connect failures and 429/503
+- Per-host timeouts and retry budgets
+- Request/retry/failure counters per host
+"""
+
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_MAX_CONCURRENCY = int(os.getenv("HTTP_MAX_CONCURRENCY", "4"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))  # seconds
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "8"))  # seconds
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# A POST that timed out reading or got a 500/502/504 may have been processed (and billed,
+# for ElevenLabs); only these statuses say for sure it wasn't.
+NON_IDEMPOTENT_RETRY_STATUSES = frozenset({429, 503})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+@dataclass
+class HostPolicy:
+    """Timeouts, retry budget and concurrency limit for one host."""
+    timeout: Tuple[float, float]
+    retries: int
+    max_concurrency: int
+
+
+class _HostState:
+    """Session, concurrency limit and counters for one host."""
+
+    def __init__(self, policy: HostPolicy):
+        self.policy = policy
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=policy.max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.semaphore = threading.BoundedSemaphore(policy.max_concurrency)
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.timeouts = 0  # every timed-out attempt, retried or not
+
+
+class HttpTransport:
+    """Pooled, retrying HTTP client shared by the agents."""
+
+    def __init__(self, logger, timeout: Tuple[float, float] = None, retries: int = None,
+                 max_concurrency: int = None):
+        self.logger = logger
+        self.default_policy = HostPolicy(
+            timeout=timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+            retries=retries if retries is not None else HTTP_RETRIES,
+            max_concurrency=max_concurrency or HTTP_MAX_CONCURRENCY,
+        )
+        self._policies: Dict[str, HostPolicy] = {}
+        self._hosts: Dict[str, _HostState] = {}
+        self._services: Dict[str, str] = {}  # host key -> service name for stats, e.g. "ollama"
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_key(url: str) -> str:
+        """'https://api.example.com/v1/x' -> 'https://api.example.com'."""
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}".lower()
+
+    def configure_host(self, url: str, timeout: Tuple[float, float] = None, retries: int = None,
+                       max_concurrency: int = None):
+        """Overrides the default policy for the host of `url` (call before its first request)."""
+        key = self.host_key(url)
+        with self._lock:
+            current = self._policies.get(key, self.default_policy)
+            self._policies[key] = HostPolicy(
+                timeout=timeout or current.timeout,
+                retries=retries if retries is not None else current.retries,
+                max_concurrency=max_concurrency or current.max_concurrency,
+            )
+
+    def label_host(self, url: str, service: str):
+        """Names the service behind the host of `url` in `stats()`."""
+        with self._lock:
+            self._services[self.host_key(url)] = service
+
+    def request(self, method: str, url: str, timeout=None, retries: int = None,
+                idempotent: bool = None, **kwargs) -> requests.Response:
+        """
+        Sends a request through the host's pooled session, retrying 429/5xx responses and
+        connection errors with jittered exponential backoff. Non-idempotent methods are only
+        retried when the request can't have been processed: connect failures and 429/503.
+        Pass `idempotent=True` for reads that happen to be sent as POST.
+        The final response is returned as-is (callers still call `raise_for_status`); the
+        final exception is re-raised.
+        """
+        host = self._host(url)
+        timeout = timeout or host.policy.timeout
+        retries = retries if retries is not None else host.policy.retries
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_statuses = RETRY_STATUSES if idempotent else NON_IDEMPOTENT_RETRY_STATUSES
+
+        attempt = 0
+        while True:
+            host.requests += 1
+            try:
+                # For streamed responses the slot is held only until the headers arrive.
+                with host.semaphore:
+                    response = host.session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                read_timeout = (isinstance(e, requests.exceptions.Timeout)
+                                and not isinstance(e, requests.exceptions.ConnectTimeout))
+                if isinstance(e, requests.exceptions.Timeout):
+                    host.timeouts += 1
+                if attempt >= retries or (read_timeout and not idempotent):
+                    host.failures += 1
+                    raise
+                delay = self._backoff(attempt)
+                self.logger.warning(f"HTTP {method} {self.host_key(url)} failed ({e}); retrying in {delay:.1f}s")
+            else:
+                if response.status_code not in retry_statuses or attempt >= retries:
+                    if response.status_code >= 400:
+                        host.failures += 1
+                    return response
+                delay = self._retry_after(response) or self._backoff(attempt)
+                self.logger.warning(f"HTTP {method} {self.host_key(url)} returned {response.status_code}; "
+                                    f"retrying in {delay:.1f}s")
+                response.close()
+            attempt += 1
+            host.retries += 1
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-host request counters for display and monitoring."""
+        with self._lock:
+            return {
+                key: {"service": self._services.get(key, key), "requests": state.requests,
+                      "retries": state.retries, "failures": state.failures, "timeouts": state.timeouts}
+                for key, state in self._hosts.items()
+            }
+
+    def close(self):
+        """Closes every pooled connection."""
+        with self._lock:
+            for state in self._hosts.values():
+                state.session.close()
+            self._hosts.clear()
+
+    def _host(self, url: str) -> _HostState:
+        key = self.host_key(url)
+        with self._lock:
+            state = self._hosts.get(key)
+            if state is None:
+                state = _HostState(self._policies.get(key, self.default_policy))
+                self._hosts[key] = state
+            return state
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        try:
+            return min(HTTP_BACKOFF_MAX, float(value)) if value else None
+        except ValueError:
+            return None  # HTTP-date form; fall back to our own backoff
+
+
+_shared_transport: Optional[HttpTransport] = None
+_shared_lock = threading.Lock()
+
+
+def get_transport(logger) -> HttpTransport:
+    """Returns the process-wide transport, creating it on first use."""
+    global _shared_transport
+    with _shared_lock:
+        if _shared_transport is None:
+            _shared_transport = HttpTransport(logger)
+        return _shared_transport
@@ -0,0 +1,55 @@
+"""
+Interaction Event Log for Personal DJ
+
+Interactions are appended to a JSONL file next to the profile instead of
+rewriting the whole profile JSON:
+- One line per event, so recording an interaction costs O(1)
+- Every event carries a sequence number; the profile snapshot remembers the
+  last one it folded in, so replaying the tail never double-counts
+- A torn last line (crash mid-append) is skipped on read
+- Truncated after the profile compacts the events into its aggregates
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+
+class InteractionLog:
+    """Append-only JSONL log of profile interaction events."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def append(self, event: Dict[str, Any]):
+        line = json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def read_since(self, seq: int) -> Iterator[Dict[str, Any]]:
+        """Yields the events with a sequence number greater than `seq`, oldest first."""
+        if not self.path.exists():
+            return
+        with self._lock, open(self.path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        for line in lines:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event.get("seq", 0) > seq:
+                yield event
+
+    def truncate(self):
+        """Drops every logged event (they're in the profile snapshot by now)."""
+        with self._lock:
+            if not self.path.exists():
+                return
+            temp_path = self.path.with_name(self.path.name + ".tmp")
+            open(temp_path, "w", encoding="utf-8").close()
+            os.replace(temp_path, self.path)
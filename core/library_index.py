@@ -0,0 +1,288 @@
+"""
+Local Library Index for Personal DJ
+
+Mirrors the Navidrome library into a local SQLite database so track selection
+is an indexed local query instead of a live API round-trip:
+- Full sync pages through the whole library with `search3`
+- Incremental sync checks `getIndexes(ifModifiedSince=...)` and only walks
+  `getAlbumList2(type="newest")` back to the previous sync
+- Indexes on genre, artist, year, duration and play count
+"""
+
+import datetime
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LIBRARY_INDEX_PATH = os.getenv("LIBRARY_INDEX_PATH", "cache/library.db")
+LIBRARY_SYNC_PAGE_SIZE = int(os.getenv("LIBRARY_SYNC_PAGE_SIZE", "500"))
+LIBRARY_FULL_SYNC_DAYS = float(os.getenv("LIBRARY_FULL_SYNC_DAYS", "7"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    artist TEXT,
+    album TEXT,
+    album_id TEXT,
+    genre TEXT,
+    year INTEGER,
+    duration INTEGER,
+    play_count INTEGER NOT NULL DEFAULT 0,
+    created TEXT,
+    synced_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tracks_genre ON tracks (genre COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_tracks_artist ON tracks (artist COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_tracks_year ON tracks (year);
+CREATE INDEX IF NOT EXISTS idx_tracks_duration ON tracks (duration);
+CREATE INDEX IF NOT EXISTS idx_tracks_play_count ON tracks (play_count);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class LibraryIndex:
+    """SQLite mirror of the Navidrome library."""
+
+    def __init__(self, logger, db_path: str = None, page_size: int = None):
+        self.logger = logger
+        self.db_path = db_path or LIBRARY_INDEX_PATH
+        self.page_size = page_size or LIBRARY_SYNC_PAGE_SIZE
+        self._lock = threading.Lock()
+        self._genres: List[str] = []
+
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        self._refresh_genres()
+
+    # --- Sync ---
+
+    def sync(self, client) -> int:
+        """Brings the index up to date, doing a full sweep when due. Returns tracks written."""
+        last_full = float(self._get_state("last_full_sync", "0"))
+        if time.time() - last_full > LIBRARY_FULL_SYNC_DAYS * 86400:
+            return self.full_sync(client)
+        return self.incremental_sync(client)
+
+    def full_sync(self, client) -> int:
+        """Pages through every song with `search3`; rows not seen in the sweep are removed."""
+        self.logger.info("Library index: starting full sync from Navidrome...")
+        sweep_started = time.time()
+        written = 0
+        offset = 0
+        while True:
+            result = client.search3("", artistCount=0, albumCount=0,
+                                    songCount=self.page_size, songOffset=offset)
+            songs = self._as_list(result.get("searchResult3", {}).get("song"))
+            if not songs:
+                break
+            written += self._upsert(songs, sweep_started)
+            offset += len(songs)
+            if len(songs) < self.page_size:
+                break
+
+        with self._lock:
+            removed = self._db.execute("DELETE FROM tracks WHERE synced_at < ?", (sweep_started,)).rowcount
+            self._db.commit()
+        self._set_state("last_full_sync", str(sweep_started))
+        self._set_state("last_sync", str(sweep_started))
+        self._set_state("last_modified", str(self._server_last_modified(client, 0)))
+        self._refresh_genres()
+        self.logger.info(f"Library index: full sync done ({written} tracks, {removed} removed).")
+        return written
+
+    def incremental_sync(self, client) -> int:
+        """Fetches only albums added since the last sync, if the server reports any change."""
+        last_sync = float(self._get_state("last_sync", "0"))
+        last_modified = int(self._get_state("last_modified", "0"))
+
+        server_modified = self._server_last_modified(client, last_modified)
+        if server_modified and server_modified <= last_modified:
+            self.logger.info("Library index: Navidrome library unchanged since last sync.")
+            return 0
+
+        self.logger.info("Library index: syncing recently added albums...")
+        sync_started = time.time()
+        written = 0
+        offset = 0
+        done = False
+        while not done:
+            result = client.getAlbumList2("newest", size=self.page_size, offset=offset)
+            albums = self._as_list(result.get("albumList2", {}).get("album"))
+            if not albums:
+                break
+            for album in albums:
+                if self._parse_timestamp(album.get("created")) < last_sync:
+                    done = True
+                    break
+                album_data = client.getAlbum(album["id"]).get("album", {})
+                written += self._upsert(self._as_list(album_data.get("song")), sync_started)
+            offset += len(albums)
+            if len(albums) < self.page_size:
+                break
+
+        self._set_state("last_sync", str(sync_started))
+        if server_modified:
+            self._set_state("last_modified", str(server_modified))
+        self._refresh_genres()
+        self.logger.info(f"Library index: incremental sync done ({written} tracks updated).")
+        return written
+
+    def _server_last_modified(self, client, since: int) -> int:
+        """Asks Navidrome when the library last changed (ms since epoch); 0 if unknown."""
+        try:
+            result = client.getIndexes(ifModifiedSince=since)
+            return int(result.get("indexes", {}).get("lastModified", 0))
+        except Exception as e:
+            self.logger.warning(f"Library index: could not read library lastModified: {e}")
+            return 0
+
+    def _upsert(self, songs: Iterable[Dict[str, Any]], synced_at: float) -> int:
+        rows = [
+            (
+                song["id"],
+                song.get("title", ""),
+                song.get("artist"),
+                song.get("album"),
+                song.get("albumId"),
+                song.get("genre"),
+                song.get("year"),
+                song.get("duration"),
+                song.get("playCount", 0),
+                song.get("created"),
+                synced_at,
+            )
+            for song in songs if song.get("id")
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO tracks (id, title, artist, album, album_id, genre, year, duration, "
+                "play_count, created, synced_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET title=excluded.title, artist=excluded.artist, "
+                "album=excluded.album, album_id=excluded.album_id, genre=excluded.genre, "
+                "year=excluded.year, duration=excluded.duration, play_count=excluded.play_count, "
+                "created=excluded.created, synced_at=excluded.synced_at",
+                rows,
+            )
+            self._db.commit()
+        return len(rows)
+
+    # --- Queries ---
+
+    def track_count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    def genres(self) -> List[str]:
+        """Distinct genres in the library (refreshed after each sync)."""
+        return list(self._genres)
+
+    def match_genres(self, text: str) -> List[str]:
+        """Returns library genres mentioned in free text such as a vibe."""
+        text = f" {self._normalize(text)} "
+        return [g for g in self._genres if f" {self._normalize(g)} " in text]
+
+    def pick_random(self, genres: Optional[List[str]] = None, artist: str = None,
+                    year_range: tuple = None, max_duration: int = None,
+                    exclude_ids: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+        """Picks a random track matching the filters using the local indexes."""
+        clauses, params = [], []
+        if genres:
+            clauses.append(f"genre COLLATE NOCASE IN ({', '.join('?' for _ in genres)})")
+            params.extend(genres)
+        if artist:
+            clauses.append("artist = ? COLLATE NOCASE")
+            params.append(artist)
+        if year_range:
+            clauses.append("year BETWEEN ? AND ?")
+            params.extend(year_range)
+        if max_duration:
+            clauses.append("duration <= ?")
+            params.append(max_duration)
+        exclude_ids = list(exclude_ids)
+        if exclude_ids:
+            clauses.append(f"id NOT IN ({', '.join('?' for _ in exclude_ids)})")
+            params.extend(exclude_ids)
+
+        with self._lock:
+            if not clauses:
+                # Unfiltered: jump to a random rowid instead of counting/offsetting.
+                bounds = self._db.execute("SELECT MIN(rowid), MAX(rowid) FROM tracks").fetchone()
+                if bounds[0] is None:
+                    return None
+                row = self._db.execute(
+                    "SELECT * FROM tracks WHERE rowid >= ? ORDER BY rowid LIMIT 1",
+                    (random.randint(bounds[0], bounds[1]),),
+                ).fetchone()
+                return dict(row) if row else None
+
+            where = " AND ".join(clauses)
+            count = self._db.execute(f"SELECT COUNT(*) FROM tracks WHERE {where}", params).fetchone()[0]
+            if not count:
+                return None
+            row = self._db.execute(
+                f"SELECT * FROM tracks WHERE {where} LIMIT 1 OFFSET ?",
+                params + [random.randrange(count)],
+            ).fetchone()
+            return dict(row) if row else None
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --- Helpers ---
+
+    def _refresh_genres(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT DISTINCT genre FROM tracks WHERE genre IS NOT NULL AND genre != ''"
+            ).fetchall()
+        self._genres = [row[0] for row in rows]
+
+    def _get_state(self, key: str, default: str) -> str:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_state(self, key: str, value: str):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value))
+            self._db.commit()
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """Lowercases and splits on punctuation so 'Hip-Hop' matches 'hip hop'."""
+        return " ".join(re.findall(r"[a-z0-9&+]+", text.lower()))
+
+    @staticmethod
+    def _as_list(value) -> List[Dict[str, Any]]:
+        """The Subsonic API returns a dict instead of a list when there's a single item."""
+        if not value:
+            return []
+        return value if isinstance(value, list) else [value]
+
+    @staticmethod
+    def _parse_timestamp(value: Optional[str]) -> float:
+        """Parses Subsonic ISO-8601 timestamps (e.g. '2024-05-01T12:00:00.000Z') to epoch seconds."""
+        if not value:
+            return 0.0
+        try:
+            return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return 0.0
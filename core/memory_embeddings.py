@@ -0,0 +1,185 @@
+"""
+Memory Embeddings for Personal DJ
+
+Picks the memories most relevant to a vibe instead of a fixed "top 3":
+- Each memory gets a cached embedding vector, stored as a NumPy matrix in
+  `profiles/<name>.embeddings.npz` next to the profile
+- Vectors come from a local feature-hashing embedder (no model needed), or an
+  Ollama embedding model when `MEMORY_EMBED_MODEL` is set
+- Top-k by cosine similarity is one matrix-vector product per request
+- NumPy is optional; without it the profile falls back to importance ranking
+"""
+
+import os
+import re
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+from dotenv import load_dotenv
+from loguru import logger as default_logger
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+load_dotenv()
+
+MEMORY_EMBED_MODEL = os.getenv("MEMORY_EMBED_MODEL", "")  # empty = local hashing embedder
+MEMORY_EMBED_DIM = int(os.getenv("MEMORY_EMBED_DIM", "256"))
+MEMORY_MIN_SIMILARITY = float(os.getenv("MEMORY_MIN_SIMILARITY", "0.1"))
+
+
+_missing_numpy_logged = False
+
+
+def embeddings_available() -> bool:
+    global _missing_numpy_logged
+    if np is None and not _missing_numpy_logged:
+        _missing_numpy_logged = True
+        default_logger.warning("NumPy is not installed; vibe-relevant memory recall is off and the "
+                               "most important memories are used instead. Install numpy to enable it.")
+    return np is not None
+
+
+class HashingEmbedder:
+    """Feature-hashing bag of words and character trigrams. Cheap, local and stable across runs."""
+
+    def __init__(self, dim: int = None):
+        self.dim = dim or MEMORY_EMBED_DIM
+        self.name = f"hash-{self.dim}"
+
+    def embed(self, text: str):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            features = [word] + [word[i:i + 3] for i in range(max(1, len(word) - 2))]
+            for feature in features:
+                # crc32, not hash(): vectors are persisted and must match across processes.
+                h = zlib.crc32(feature.encode("utf-8"))
+                vector[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        return vector
+
+
+class OllamaEmbedder:
+    """Embeddings from a local Ollama embedding model (e.g. nomic-embed-text)."""
+
+    def __init__(self, logger, model: str):
+        from core.ollama_client import OllamaClient
+
+        self.client = OllamaClient(logger, model)
+        self.model = model
+        self.name = f"ollama-{model}"
+
+    def embed(self, text: str):
+        return np.asarray(self.client.embed(text, self.model), dtype=np.float32)
+
+
+class MemoryEmbeddings:
+    """Embedding matrix for a profile's memories, kept in sync by memory ID."""
+
+    def __init__(self, path: Path, embedder=None, logger=None):
+        self.path = Path(path)
+        self.logger = logger or default_logger
+        if embedder is None:
+            embedder = OllamaEmbedder(self.logger, MEMORY_EMBED_MODEL) if MEMORY_EMBED_MODEL else HashingEmbedder()
+        self.embedder = embedder
+        self._ids: List[str] = []
+        self._row: Dict[str, int] = {}
+        self._matrix = None  # (n, dim) float32, rows L2-normalized
+        self._claimed: Set[str] = set()  # IDs a sync() is embedding right now
+        self._lock = threading.Lock()
+        self.dirty = False
+        self._load()
+
+    def sync(self, memories: Iterable) -> bool:
+        """Embeds new memories and drops deleted ones. Returns True if anything changed."""
+        memories = list(memories)
+        wanted = {m.id for m in memories}
+        with self._lock:
+            # Claimed under the lock, so concurrent syncs never embed the same memory twice.
+            missing = [m for m in memories if m.id not in self._row and m.id not in self._claimed]
+            stale = [i for i in self._ids if i not in wanted]
+            if not missing and not stale:
+                return False
+            self._claimed.update(m.id for m in missing)
+
+        new_ids, new_rows = [], []
+        try:
+            for memory in missing:
+                vector = self._embed(" ".join([memory.content, *memory.tags]))
+                if vector is not None:
+                    new_ids.append(memory.id)
+                    new_rows.append(vector)
+        finally:
+            with self._lock:
+                self._claimed.difference_update(m.id for m in missing)
+                keep = [i for i in self._ids if i in wanted]
+                rows = [self._matrix[self._row[i]] for i in keep] + new_rows
+                self._ids = keep + new_ids
+                self._row = {memory_id: n for n, memory_id in enumerate(self._ids)}
+                self._matrix = np.vstack(rows).astype(np.float32) if rows else None
+                self.dirty = True
+        return True
+
+    def top_k(self, text: str, k: int, min_similarity: float = None) -> List[str]:
+        """IDs of the k memories most similar to `text`, best first."""
+        threshold = MEMORY_MIN_SIMILARITY if min_similarity is None else min_similarity
+        with self._lock:
+            matrix, ids = self._matrix, list(self._ids)
+        if matrix is None or not ids:
+            return []
+        query = self._embed(text)
+        if query is None or query.shape[0] != matrix.shape[1]:
+            return []
+
+        scores = matrix @ query
+        k = min(k, len(ids))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [ids[i] for i in best if scores[i] >= threshold]
+
+    def save(self):
+        """Atomically writes the matrix next to the profile."""
+        with self._lock:
+            if not self.dirty:
+                return
+            ids, matrix = list(self._ids), self._matrix
+            self.dirty = False
+        self.path.parent.mkdir(exist_ok=True)
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temp_path, "wb") as f:
+            np.savez(
+                f,
+                ids=np.array(ids, dtype=str),
+                vectors=matrix if matrix is not None else np.zeros((0, 0), dtype=np.float32),
+                embedder=np.array(self.embedder.name),
+            )
+        os.replace(temp_path, self.path)
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data["embedder"]) != self.embedder.name:
+                    self.logger.info("Memory embeddings were made by a different embedder; rebuilding.")
+                    return
+                ids = [str(i) for i in data["ids"]]
+                vectors = data["vectors"]
+            if ids:
+                self._ids = ids
+                self._row = {memory_id: n for n, memory_id in enumerate(ids)}
+                self._matrix = vectors.astype(np.float32)
+        except Exception as e:
+            self.logger.warning(f"Could not load memory embeddings from {self.path}: {e}")
+
+    def _embed(self, text: str):
+        try:
+            vector = np.asarray(self.embedder.embed(text), dtype=np.float32)
+        except Exception as e:
+            self.logger.warning(f"Could not embed memory text: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
@@ -0,0 +1,127 @@
+"""
+Memory Index for Personal DJ
+
+Keeps user memories searchable without scanning every memory per lookup:
+- Inverted index from content/tag tokens to memory IDs, with prefix lookups
+  over a sorted vocabulary
+- Category buckets
+- Importance buckets (1-5) for top-k queries
+- Results ranked by importance, then by most recent use
+"""
+
+import bisect
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class MemoryIndex:
+    """In-memory indexes over a profile's UserMemory objects."""
+
+    def __init__(self, memories: Iterable = ()):
+        self.rebuild(memories)
+
+    def rebuild(self, memories: Iterable):
+        """Re-indexes from scratch (after load or import)."""
+        self._memories: Dict[str, object] = {}
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._vocabulary: List[str] = []  # sorted, for prefix lookups
+        self._categories: Dict[str, Set[str]] = defaultdict(set)
+        self._importance: Dict[int, Set[str]] = defaultdict(set)
+        self._tokens: Dict[str, Set[str]] = {}  # memory id -> its tokens, for removal
+        for memory in memories:
+            self.add(memory)
+
+    def __len__(self) -> int:
+        return len(self._memories)
+
+    def __contains__(self, memory_id: str) -> bool:
+        return memory_id in self._memories
+
+    def get(self, memory_id: str):
+        return self._memories.get(memory_id)
+
+    def add(self, memory):
+        if memory.id in self._memories:
+            self.remove(memory.id)
+        self._memories[memory.id] = memory
+        tokens = set(tokenize(memory.content))
+        for tag in memory.tags:
+            tokens.update(tokenize(tag))
+        self._tokens[memory.id] = tokens
+        for token in tokens:
+            if token not in self._postings:
+                bisect.insort(self._vocabulary, token)
+            self._postings[token].add(memory.id)
+        self._categories[memory.category].add(memory.id)
+        self._importance[memory.importance].add(memory.id)
+
+    def remove(self, memory_id: str):
+        memory = self._memories.pop(memory_id, None)
+        if memory is None:
+            return
+        for token in self._tokens.pop(memory_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.discard(memory_id)
+            if not postings:
+                del self._postings[token]
+                i = bisect.bisect_left(self._vocabulary, token)
+                if i < len(self._vocabulary) and self._vocabulary[i] == token:
+                    del self._vocabulary[i]
+        self._categories[memory.category].discard(memory_id)
+        self._importance[memory.importance].discard(memory_id)
+
+    # --- Queries (all ranked by importance, then recency) ---
+
+    def search(self, query: str) -> List:
+        """Memories whose content or tags contain every query word (as a word prefix)."""
+        words = tokenize(query)
+        if not words:
+            return []
+        matches: Optional[Set[str]] = None
+        for word in words:
+            ids = self._prefix_postings(word)
+            matches = ids if matches is None else matches & ids
+            if not matches:
+                return []
+        return self._ranked(matches)
+
+    def by_category(self, category: str) -> List:
+        return self._ranked(self._categories.get(category, ()))
+
+    def by_importance(self, min_importance: int = 3) -> List:
+        ids = set()
+        for importance, bucket in self._importance.items():
+            if importance >= min_importance:
+                ids |= bucket
+        return self._ranked(ids)
+
+    def top(self, k: int, min_importance: int = 1) -> List:
+        """The k highest-ranked memories, filling from the highest importance bucket down."""
+        results = []
+        for importance in sorted(self._importance, reverse=True):
+            if importance < min_importance or len(results) >= k:
+                break
+            results.extend(self._ranked(self._importance[importance]))
+        return results[:k]
+
+    def _prefix_postings(self, prefix: str) -> Set[str]:
+        ids = set()
+        i = bisect.bisect_left(self._vocabulary, prefix)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(prefix):
+            ids |= self._postings[self._vocabulary[i]]
+            i += 1
+        return ids
+
+    def _ranked(self, ids: Iterable[str]) -> List:
+        memories = [self._memories[i] for i in ids if i in self._memories]
+        memories.sort(key=lambda m: (m.importance, m.last_referenced or m.created_date), reverse=True)
+        return memories
@@ -0,0 +1,176 @@
+"""
+Latency Metrics for Personal DJ
+
+Tells which stage made a vibe slow (Ollama, Navidrome, TTS or the player):
+- `timed("name")` works as a context manager and as a decorator
+- Durations go into in-process HDR-style histograms: log-linear buckets with
+  ~1% precision, constant memory, no sample lists
+- p50/p95/p99 per stage are shown by the CLI `status` command and can be
+  dumped to JSON (`metrics` command)
+- Exceptions inside a timed block also count towards `<name>.errors`
+"""
+
+import functools
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+# Linear below 128 µs, then 64 sub-buckets per power of two (~1% relative error).
+_SUB_BUCKET_BITS = 7
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+_HALF = _SUB_BUCKETS >> 1
+
+
+def _bucket_index(micros: int) -> int:
+    if micros < _SUB_BUCKETS:
+        return micros
+    shift = micros.bit_length() - _SUB_BUCKET_BITS
+    return (shift << (_SUB_BUCKET_BITS - 1)) + (micros >> shift)
+
+
+def _bucket_value(index: int) -> float:
+    """Midpoint (in µs) of the values that land in a bucket."""
+    if index < _SUB_BUCKETS:
+        return float(index)
+    shift = (index >> (_SUB_BUCKET_BITS - 1)) - 1
+    sub_bucket = index - (shift << (_SUB_BUCKET_BITS - 1))
+    return (sub_bucket << shift) + ((1 << shift) - 1) / 2
+
+
+class LatencyHistogram:
+    """HDR-style latency histogram (microsecond resolution, sparse buckets)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._counts: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0  # seconds
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def record(self, seconds: float):
+        seconds = max(0.0, seconds)
+        index = _bucket_index(int(seconds * 1_000_000))
+        with self._lock:
+            self._counts[index] = self._counts.get(index, 0) + 1
+            self.count += 1
+            self.total += seconds
+            self.min = seconds if self.min is None else min(self.min, seconds)
+            self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The q-th percentile (0-100) in seconds, or None if nothing was recorded."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = max(1, int(round(q / 100 * self.count)))
+            seen = 0
+            for index in sorted(self._counts):
+                seen += self._counts[index]
+                if seen >= rank:
+                    # Bucket midpoints can overshoot the real extremes slightly.
+                    return min(max(_bucket_value(index) / 1_000_000, self.min), self.max)
+            return self.max
+
+    def snapshot(self) -> Dict[str, float]:
+        """Count plus mean/p50/p95/p99/max in milliseconds."""
+        with self._lock:
+            count, total, maximum = self.count, self.total, self.max
+        if not count:
+            return {"count": 0}
+        return {
+            "count": count,
+            "mean_ms": round(total / count * 1000, 2),
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p95_ms": round(self.percentile(95) * 1000, 2),
+            "p99_ms": round(self.percentile(99) * 1000, 2),
+            "max_ms": round(maximum * 1000, 2),
+        }
+
+
+class MetricsRegistry:
+    """Named latency histograms and counters for the whole process."""
+
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram(name)
+            return histogram
+
+    def record(self, name: str, seconds: float):
+        self.histogram(name).record(seconds)
+
+    def increment(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def histograms(self) -> Dict[str, LatencyHistogram]:
+        with self._lock:
+            return dict(self._histograms)
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {
+            "histograms": {name: h.snapshot() for name, h in sorted(self.histograms().items())},
+            "counters": dict(sorted(self.counters().items())),
+        }
+
+    def dump_json(self, path: str = None) -> str:
+        """Returns the snapshot as JSON, also writing it to `path` if given."""
+        text = json.dumps(self.snapshot(), indent=2)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+        return text
+
+
+metrics = MetricsRegistry()
+
+
+class timed:
+    """
+    Times a block or function into the `name` histogram:
+
+        with timed("navidrome_track"):
+            ...
+
+        @timed("tts_speak")
+        def speak(...): ...
+    """
+
+    def __init__(self, name: str, registry: MetricsRegistry = None):
+        self.name = name
+        self.registry = registry or metrics
+        self._local = threading.local()  # one decorator instance is shared by every call
+
+    def __enter__(self):
+        starts = getattr(self._local, "starts", None)
+        if starts is None:
+            starts = self._local.starts = []
+        starts.append(time.perf_counter())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._local.starts.pop()
+        self.registry.record(self.name, elapsed)
+        if exc_type is not None:
+            self.registry.increment(f"{self.name}.errors")
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+        return wrapper
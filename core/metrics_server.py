@@ -0,0 +1,194 @@
+"""
+Metrics Endpoint for Personal DJ
+
+Optional Prometheus endpoint so DJ boxes can be watched without scraping logs:
+- Started by run.py when `METRICS_PORT` is set; serves `/metrics` in the
+  Prometheus text format from a background thread
+- Per-stage latency summaries (p50/p95/p99) plus stage error/timeout counters
+- Commentary, TTS and track pool cache hit ratios
+- Request, retry, failure and timeout counts per upstream (Navidrome, ElevenLabs, Ollama)
+- MusicAgent state, requests in the pipeline, active threads and RSS
+- Flask is optional; without it the endpoint is skipped with a warning
+"""
+
+import os
+import sys
+import threading
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from core.http_transport import get_transport
+from core.metrics import metrics
+
+try:
+    from flask import Flask, Response
+    from werkzeug.serving import make_server
+except ImportError:
+    Flask = None
+
+load_dotenv()
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 = disabled
+
+PREFIX = "personal_dj"
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _PrometheusWriter:
+    """Collects samples and renders them grouped by metric, with HELP/TYPE headers."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Dict] = {}
+
+    def add(self, name: str, kind: str, help_text: str, value, labels: Dict[str, str] = None, suffix: str = ""):
+        metric = self._metrics.setdefault(name, {"kind": kind, "help": help_text, "samples": []})
+        metric["samples"].append((suffix, labels or {}, value))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name, metric in self._metrics.items():
+            full_name = f"{PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {metric['help']}")
+            lines.append(f"# TYPE {full_name} {metric['kind']}")
+            for suffix, labels, value in metric["samples"]:
+                label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+                label_text = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{full_name}{suffix}{label_text} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _rss_bytes() -> Optional[int]:
+    """
+    Current resident set size; falls back to the peak where /proc isn't available.
+    None on Windows, which has neither (`resource` is POSIX-only).
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def render_metrics(logger, dispatcher=None) -> str:
+    """All Personal DJ metrics in the Prometheus text format."""
+    out = _PrometheusWriter()
+
+    # Stage latencies and stage error/timeout counters
+    for stage, histogram in sorted(metrics.histograms().items()):
+        if not histogram.count:
+            continue
+        for q in QUANTILES:
+            out.add("stage_latency_seconds", "summary", "Latency of a DJ pipeline stage.",
+                    histogram.percentile(q * 100), {"stage": stage, "quantile": str(q)})
+        out.add("stage_latency_seconds", "summary", "", histogram.total, {"stage": stage}, suffix="_sum")
+        out.add("stage_latency_seconds", "summary", "", histogram.count, {"stage": stage}, suffix="_count")
+    for counter, value in sorted(metrics.counters().items()):
+        stage, _, kind = counter.rpartition(".")
+        if kind in ("errors", "timeouts"):
+            out.add(f"stage_{kind}_total", "counter", f"Stage {kind} since start.", value, {"stage": stage})
+
+    # Upstream HTTP services
+    for host, stats in sorted(get_transport(logger).stats().items()):
+        labels = {"service": stats["service"], "host": host}
+        for field in ("requests", "retries", "failures", "timeouts"):
+            out.add(f"http_{field}_total", "counter", f"HTTP {field} per upstream service.", stats[field], labels)
+
+    process_metrics(out)
+    if dispatcher is not None:
+        agent_metrics(out, dispatcher)
+    return out.render()
+
+
+def process_metrics(out: _PrometheusWriter):
+    out.add("process_threads", "gauge", "Active Python threads.", threading.active_count())
+    rss = _rss_bytes()
+    if rss is not None:
+        out.add("process_resident_memory_bytes", "gauge", "Resident set size.", rss)
+
+
+def agent_metrics(out: _PrometheusWriter, dispatcher):
+    """Cache, player and pipeline state from a running dispatcher."""
+    caches = {
+        "commentary": dispatcher.dj_agent.commentary_cache.stats(),
+        "tts": dispatcher.voice_agent.tts_cache.stats(),
+    }
+    if dispatcher.dj_agent.track_pool:
+        caches["track_pool"] = dispatcher.dj_agent.track_pool.stats()
+    for cache, stats in caches.items():
+        hits, misses = stats["hits"], stats["misses"]
+        out.add("cache_hits_total", "counter", "Cache hits.", hits, {"cache": cache})
+        out.add("cache_misses_total", "counter", "Cache misses.", misses, {"cache": cache})
+        out.add("cache_hit_ratio", "gauge", "Cache hit ratio since start.",
+                hits / (hits + misses) if hits + misses else 0.0, {"cache": cache})
+
+    music_agent = dispatcher.music_agent
+    status = music_agent.get_status()
+    out.add("player_playing", "gauge", "1 while a track or clip is playing.", status["is_playing"])
+    out.add("player_paused", "gauge", "1 while playback is paused.", status["is_paused"])
+    out.add("player_volume", "gauge", "Player volume (0-100).", status["volume"])
+    out.add("player_position_seconds", "gauge", "Position in the current item.", float(status["position"] or 0))
+    out.add("player_duration_seconds", "gauge", "Duration of the current item.", float(status["duration"] or 0))
+    out.add("player_queued", "gauge", "1 while items are waiting in the play queue.", music_agent.has_queued_tracks())
+    out.add("player_info", "gauge", "The media player in use.", 1, {"player": status["player"] or "none"})
+    for source_type, totals in music_agent.source_detector.get_source_totals().items():
+        labels = {"source": source_type}
+        # Totals over the sources still registered, so they drop on eviction: gauges, not counters.
+        out.add("source_plays", "gauge", "Plays per source type (registered sources).", int(totals["plays"]), labels)
+        out.add("source_failures", "gauge", "Playback failures per source type (registered sources).", int(totals["failures"]), labels)
+        out.add("source_play_seconds", "gauge", "Listening time per source type (registered sources).", totals["play_seconds"], labels)
+
+    out.add("pipeline_in_flight", "gauge", "DJ requests currently in the pipeline.", dispatcher.pipeline.in_flight())
+
+
+def start_metrics_server(logger, get_dispatcher: Callable[[], Optional[object]],
+                         host: str = None, port: int = None):
+    """
+    Serves `/metrics` on a daemon thread. `get_dispatcher` returns the current
+    dispatcher (or None before the GUI has created one). Returns the server, or
+    None if the endpoint is disabled or Flask isn't installed.
+    """
+    host = host or METRICS_HOST
+    port = port if port is not None else METRICS_PORT
+    if not port:
+        return None
+    if Flask is None:
+        logger.warning("METRICS_PORT is set but Flask is not installed; metrics endpoint disabled.")
+        return None
+
+    app = Flask("personal_dj_metrics")
+
+    @app.route("/metrics")
+    def prometheus_metrics():
+        try:
+            body = render_metrics(logger, get_dispatcher())
+        except Exception as e:
+            logger.error(f"Failed to render metrics: {e}", exc_info=True)
+            return Response(f"# error rendering metrics: {e}\n", status=500, mimetype="text/plain")
+        return Response(body, mimetype="text/plain; version=0.0.4")
+
+    try:
+        server = make_server(host, port, app, threaded=True)
+    except OSError as e:
+        logger.error(f"Could not start metrics endpoint on {host}:{port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return server
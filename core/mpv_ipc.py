@@ -0,0 +1,237 @@
+"""
+mpv JSON IPC Client for Personal DJ
+
+Drives a single long-lived mpv process over its `--input-ipc-server` socket:
+- One player per session, so no process startup or audio-device reopen per item
+- `loadfile ... append-play` for gapless queueing of commentary and tracks
+- Real pause/resume/volume/seek via `set_property` and `seek`
+- A reader thread that matches command replies and forwards mpv events,
+  including `observe_property` change notifications
+"""
+
+import atexit
+import json
+import os
+import platform
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional
+
+from core.error_handler import AudioPlaybackError
+
+
+class MpvIpcClient:
+    """Owns one idle mpv process and talks to it over JSON IPC."""
+
+    CONNECT_TIMEOUT = 5  # seconds to wait for mpv to create its IPC socket
+    COMMAND_TIMEOUT = 3  # seconds to wait for a command reply
+
+    def __init__(self, logger, executable: str = "mpv", socket_path: str = None,
+                 extra_args: List[str] = None,
+                 event_callback: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.logger = logger
+        self.executable = executable
+        self.socket_path = socket_path or self._default_socket_path()
+        self.extra_args = extra_args or []
+        self.event_callback = event_callback
+
+        self.process = None
+        self._sock = None
+        self._pipe = None  # Windows named pipe file object
+        self._reader_thread = None
+        self._write_lock = threading.Lock()
+        self._pending: Dict[int, Future] = {}
+        self._pending_lock = threading.Lock()
+        self._request_id = 0
+        self._closed = True
+
+    @staticmethod
+    def _default_socket_path() -> str:
+        name = f"personal-dj-mpv-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        if platform.system() == "Windows":
+            return rf"\\.\pipe\{name}"
+        return os.path.join(tempfile.gettempdir(), f"{name}.sock")
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Launches mpv in idle mode and connects to its IPC socket."""
+        if platform.system() != "Windows" and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        args = [
+            self.executable,
+            "--idle=yes",
+            "--no-video",
+            "--no-terminal",
+            "--gapless-audio=yes",
+            f"--input-ipc-server={self.socket_path}",
+            *self.extra_args,
+        ]
+        self.process = subprocess.Popen(
+            args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self._connect()
+        self._closed = False
+        self._reader_thread = threading.Thread(target=self._read_loop, name="mpv-ipc-reader", daemon=True)
+        self._reader_thread.start()
+        # An idle mpv would otherwise outlive the application.
+        atexit.register(self.close)
+        self.logger.info(f"mpv IPC: connected to persistent player at {self.socket_path}")
+
+    def _connect(self):
+        deadline = time.monotonic() + self.CONNECT_TIMEOUT
+        last_error = None
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise AudioPlaybackError("mpv exited before its IPC socket was ready.",
+                                         details={"returncode": self.process.returncode})
+            try:
+                if platform.system() == "Windows":
+                    self._pipe = open(self.socket_path, "r+b", buffering=0)
+                else:
+                    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    sock.connect(self.socket_path)
+                    self._sock = sock
+                return
+            except OSError as e:
+                last_error = e
+                time.sleep(0.05)
+        self.process.terminate()
+        raise AudioPlaybackError("Timed out connecting to mpv IPC socket.",
+                                 details={"socket": self.socket_path}, original_error=last_error)
+
+    def is_alive(self) -> bool:
+        return not self._closed and self.process is not None and self.process.poll() is None
+
+    def close(self):
+        """Asks mpv to quit and cleans up the socket."""
+        if self.is_alive():
+            try:
+                self.command("quit", wait=False)
+            except AudioPlaybackError:
+                pass
+        self._closed = True
+        if self.process and self.process.poll() is None:
+            try:
+                self.process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.process.terminate()
+                self.process.wait()
+        for handle in (self._sock, self._pipe):
+            if handle:
+                try:
+                    handle.close()
+                except OSError:
+                    pass
+        self._sock = self._pipe = None
+        if platform.system() != "Windows" and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    # --- Commands ---
+
+    def command(self, *args, wait: bool = True) -> Any:
+        """Sends an IPC command and returns its `data`, raising AudioPlaybackError on failure."""
+        if self._closed:
+            raise AudioPlaybackError("mpv IPC connection is closed.")
+
+        future = Future()
+        with self._pending_lock:
+            self._request_id += 1
+            request_id = self._request_id
+            if wait:
+                self._pending[request_id] = future
+
+        message = json.dumps({"command": list(args), "request_id": request_id}) + "\n"
+        try:
+            self._write(message.encode("utf-8"))
+        except OSError as e:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            raise AudioPlaybackError("Failed to send command to mpv.",
+                                     details={"command": list(args)}, original_error=e)
+        if not wait:
+            return None
+
+        try:
+            reply = future.result(timeout=self.COMMAND_TIMEOUT)
+        except FutureTimeoutError:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            raise AudioPlaybackError("mpv did not answer in time.", details={"command": list(args)})
+        if reply.get("error") != "success":
+            raise AudioPlaybackError(f"mpv rejected command: {reply.get('error')}",
+                                     details={"command": list(args)})
+        return reply.get("data")
+
+    def loadfile(self, path: str, mode: str = "replace"):
+        """Loads a file or URL; `append-play` queues it gaplessly after the current item."""
+        return self.command("loadfile", path, mode)
+
+    def set_property(self, name: str, value: Any):
+        return self.command("set_property", name, value)
+
+    def get_property(self, name: str) -> Any:
+        return self.command("get_property", name)
+
+    def observe_property(self, name: str, observer_id: int):
+        """Subscribes to `property-change` events for a property (delivered via event_callback)."""
+        return self.command("observe_property", observer_id, name)
+
+    def seek(self, seconds: float):
+        return self.command("seek", seconds, "absolute")
+
+    def stop(self):
+        """Stops playback and clears mpv's playlist; the process stays idle."""
+        return self.command("stop")
+
+    # --- I/O ---
+
+    def _write(self, data: bytes):
+        with self._write_lock:
+            if self._sock:
+                self._sock.sendall(data)
+            elif self._pipe:
+                self._pipe.write(data)
+            else:
+                raise OSError("mpv IPC is not connected")
+
+    def _read_loop(self):
+        """Reads newline-delimited JSON from mpv, resolving replies and forwarding events."""
+        stream = self._sock.makefile("rb") if self._sock else self._pipe
+        try:
+            for raw in stream:
+                try:
+                    message = json.loads(raw)
+                except ValueError:
+                    continue
+                if "event" in message:
+                    if self.event_callback:
+                        try:
+                            self.event_callback(message)
+                        except Exception as e:
+                            self.logger.error(f"mpv event handler failed: {e}", exc_info=True)
+                    continue
+                request_id = message.get("request_id")
+                with self._pending_lock:
+                    future = self._pending.pop(request_id, None)
+                if future:
+                    future.set_result(message)
+        except (OSError, ValueError):
+            pass
+        finally:
+            was_open = not self._closed
+            self._closed = True
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                future.set_result({"error": "disconnected"})
+            if was_open:
+                self.logger.warning("mpv IPC: connection to the player was lost.")
+                if self.event_callback:
+                    self.event_callback({"event": "disconnected"})
@@ -7,15 +7,50 @@ This module identifies and tracks music sources including:
 - External streaming URLs
 - Different media players (mpv, vlc, ffplay)
 - System audio sources
+
+URL detection is a hostname table lookup (exact host, then parent domains),
+then one precompiled regex with a named group per source type, tried in a
+fixed priority order. Results are memoized in a bounded LRU, keyed by the URL
+without its Subsonic auth parameters (libsonic salts every stream URL anew).
+
+Registered sources live in a bounded LRU registry, under the same credential-free
+key, with running per-type counters (sources, plays, failures, play time), so
+statistics are O(1).
 """
 
 import os
 import re
+import threading
+import time
 import urllib.parse
+from collections import OrderedDict, defaultdict
 from typing import Dict, Optional, Tuple
 from dataclasses import dataclass
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SOURCE_DETECT_CACHE_SIZE = int(os.getenv("SOURCE_DETECT_CACHE_SIZE", "1024"))
+SOURCE_REGISTRY_SIZE = int(os.getenv("SOURCE_REGISTRY_SIZE", "500"))
+
+# Subsonic auth query parameters: user, token, salt and password. The salt and token change
+# on every getStreamUrl call, and none of them belong in memo keys or source details.
+AUTH_QUERY_PARAMS = frozenset({"u", "t", "s", "p"})
+
+
+def source_key(track_path: str) -> str:
+    """The path with credentials dropped from URLs, so repeat plays of a track share one key."""
+    if not track_path or not track_path.startswith(("http://", "https://")):
+        return track_path
+    parsed = urllib.parse.urlsplit(track_path)
+    if not parsed.query:
+        return track_path
+    query = [(k, v) for k, v in urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+             if k not in AUTH_QUERY_PARAMS]
+    return urllib.parse.urlunsplit(parsed._replace(query=urllib.parse.urlencode(query)))
+
 
 @dataclass
 class MusicSource:
@@ -27,13 +62,67 @@ class MusicSource:
     icon: str  # Emoji or icon for display
 
 
+@dataclass
+class SourceRecord:
+    """Usage of one registered track path."""
+    source: MusicSource
+    plays: int = 0
+    failures: int = 0
+    play_seconds: float = 0.0
+    last_played: float = 0.0
+
+
 class MusicSourceDetector:
     """Detects and categorizes music sources."""
     
-    def __init__(self, logger):
+    # URL patterns are tried in this order; catch-alls like radio_stream go last.
+    SOURCE_PRIORITY = ('navidrome', 'spotify', 'youtube', 'soundcloud', 'radio_stream')
+    
+    # Static, so it isn't rebuilt on every status refresh.
+    PLAYER_INFO = {
+        'mpv': {
+            'name': 'MPV Media Player',
+            'icon': '🎬',
+            'description': 'Free, open source, and cross-platform media player',
+            'features': ['Hardware acceleration', 'Extensive format support', 'Command-line control']
+        },
+        'vlc': {
+            'name': 'VLC Media Player',
+            'icon': '🔶',
+            'description': 'Free and open source cross-platform multimedia player',
+            'features': ['Universal codec support', 'Streaming capabilities', 'Cross-platform']
+        },
+        'ffplay': {
+            'name': 'FFplay',
+            'icon': '⚡',
+            'description': 'Simple media player using FFmpeg libraries',
+            'features': ['Lightweight', 'Part of FFmpeg suite', 'Command-line based']
+        },
+        'windows_media_player': {
+            'name': 'Windows Media Player',
+            'icon': '🪟',
+            'description': 'Built-in Windows media player',
+            'features': ['Windows integration', 'Library management', 'Visualization']
+        }
+    }
+    
+    # Types always present in get_source_statistics(), even at zero.
+    STATISTIC_TYPES = ('navidrome', 'local_file', 'stream_url', 'unknown')
+    
+    def __init__(self, logger, cache_size: int = None, registry_size: int = None):
         self.logger = logger
-        self.known_sources = {}
+        self.registry_size = registry_size or SOURCE_REGISTRY_SIZE
+        self.known_sources: "OrderedDict[str, SourceRecord]" = OrderedDict()  # LRU, capped at registry_size
+        self._registry_lock = threading.Lock()
+        # Running totals per source type, kept in step with the registry on register and evict.
+        self._type_totals: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"sources": 0, "plays": 0, "failures": 0, "play_seconds": 0.0}
+        )
         self._load_source_patterns()
+        self._compile_matchers()
+        self.cache_size = cache_size or SOURCE_DETECT_CACHE_SIZE
+        self._detect_cache: "OrderedDict[Tuple[str, str], MusicSource]" = OrderedDict()
+        self._cache_lock = threading.Lock()
     
     def _load_source_patterns(self):
         """Load patterns for detecting different music sources."""
@@ -45,6 +134,7 @@ class MusicSourceDetector:
                     r'.*/api/stream.*',
                     r'.*:4533.*'  # Default Navidrome port
                 ],
+                'hosts': [urllib.parse.urlparse(os.getenv("NAVIDROME_URL", "")).hostname or ""],
                 'icon': '🎵',
                 'name': 'Navidrome Server'
             },
@@ -53,6 +143,7 @@ class MusicSourceDetector:
                     r'.*spotify\.com.*',
                     r'.*open\.spotify\.com.*'
                 ],
+                'hosts': ['spotify.com'],
                 'icon': '🎧',
                 'name': 'Spotify'
             },
@@ -62,6 +153,7 @@ class MusicSourceDetector:
                     r'.*youtu\.be.*',
                     r'.*youtube-nocookie\.com.*'
                 ],
+                'hosts': ['youtube.com', 'youtu.be', 'youtube-nocookie.com'],
                 'icon': '📺',
                 'name': 'YouTube'
             },
@@ -69,6 +161,7 @@ class MusicSourceDetector:
                 'url_patterns': [
                     r'.*soundcloud\.com.*'
                 ],
+                'hosts': ['soundcloud.com'],
                 'icon': '☁️',
                 'name': 'SoundCloud'
             },
@@ -79,6 +172,7 @@ class MusicSourceDetector:
                     r'.*radio.*',
                     r'.*stream.*'
                 ],
+                'hosts': [],
                 'icon': '📻',
                 'name': 'Radio Stream'
             }
@@ -89,8 +183,51 @@ class MusicSourceDetector:
             'playlist': ['.m3u', '.m3u8', '.pls', '.xspf']
         }
     
+    def _compile_matchers(self):
+        """Builds the hostname table and the combined URL regex from the source patterns."""
+        # Hostname (or parent domain) -> source type
+        self._host_table: Dict[str, str] = {}
+        alternatives = []
+        for source_type in self.SOURCE_PRIORITY:
+            config = self.source_patterns[source_type]
+            for host in config.get('hosts', []):
+                if host:
+                    self._host_table.setdefault(host.lower(), source_type)
+            # Each alternative is anchored at the start, so the first source type in
+            # priority order that matches anywhere in the URL wins.
+            body = "|".join(f"(?:{pattern})" for pattern in config['url_patterns'])
+            alternatives.append(f"(?P<{source_type}>{body})")
+        self._url_matcher = re.compile("^(?:" + "|".join(alternatives) + ")", re.IGNORECASE)
+    
+    def _match_url(self, url: str, hostname: str) -> Optional[str]:
+        """Source type for a URL: hostname table first, then the combined regex."""
+        host = hostname.lower()
+        while host:
+            source_type = self._host_table.get(host)
+            if source_type:
+                return source_type
+            _, _, host = host.partition(".")  # www.youtube.com -> youtube.com -> com
+        match = self._url_matcher.match(url)
+        return match.lastgroup if match else None
+    
     def detect_source(self, track_path: str, player: str = "unknown") -> MusicSource:
-        """Detect the source of a music track."""
+        """Detect the source of a music track (memoized per credential-free path and player)."""
+        track_path = source_key(track_path)
+        key = (track_path, player)
+        with self._cache_lock:
+            source = self._detect_cache.get(key)
+            if source is not None:
+                self._detect_cache.move_to_end(key)
+                return source
+        
+        source = self._detect_source(track_path, player)
+        with self._cache_lock:
+            self._detect_cache[key] = source
+            while len(self._detect_cache) > self.cache_size:
+                self._detect_cache.popitem(last=False)
+        return source
+    
+    def _detect_source(self, track_path: str, player: str) -> MusicSource:
         if not track_path:
             return MusicSource(
                 source_type="unknown",
@@ -122,27 +259,27 @@ class MusicSourceDetector:
         parsed_url = urllib.parse.urlparse(url)
         hostname = parsed_url.hostname or ""
         
-        # Check against known patterns
-        for source_type, config in self.source_patterns.items():
-            for pattern in config['url_patterns']:
-                if re.match(pattern, url, re.IGNORECASE):
-                    details = {
-                        "url": url,
-                        "hostname": hostname,
-                        "port": str(parsed_url.port) if parsed_url.port else "default"
-                    }
-                    
-                    # Special handling for Navidrome
-                    if source_type == 'navidrome':
-                        details.update(self._extract_navidrome_details(url))
-                    
-                    return MusicSource(
-                        source_type=source_type,
-                        source_name=config['name'],
-                        player=player,
-                        details=details,
-                        icon=config['icon']
-                    )
+        # Check against known hosts and patterns
+        source_type = self._match_url(url, hostname)
+        if source_type:
+            config = self.source_patterns[source_type]
+            details = {
+                "url": url,
+                "hostname": hostname,
+                "port": str(parsed_url.port) if parsed_url.port else "default"
+            }
+            
+            # Special handling for Navidrome
+            if source_type == 'navidrome':
+                details.update(self._extract_navidrome_details(url))
+            
+            return MusicSource(
+                source_type=source_type,
+                source_name=config['name'],
+                player=player,
+                details=details,
+                icon=config['icon']
+            )
         
         # Generic streaming URL
         return MusicSource(
@@ -198,8 +335,6 @@ class MusicSourceDetector:
         # Common Navidrome parameters
         if 'id' in query_params:
             details['track_id'] = query_params['id'][0]
-        if 'u' in query_params:
-            details['username'] = query_params['u'][0]
         if 'c' in query_params:
             details['client'] = query_params['c'][0]
         
@@ -238,34 +373,7 @@ class MusicSourceDetector:
     
     def get_player_info(self, player_executable: str) -> Dict[str, str]:
         """Get information about the media player being used."""
-        player_info = {
-            'mpv': {
-                'name': 'MPV Media Player',
-                'icon': '🎬',
-                'description': 'Free, open source, and cross-platform media player',
-                'features': ['Hardware acceleration', 'Extensive format support', 'Command-line control']
-            },
-            'vlc': {
-                'name': 'VLC Media Player',
-                'icon': '🔶',
-                'description': 'Free and open source cross-platform multimedia player',
-                'features': ['Universal codec support', 'Streaming capabilities', 'Cross-platform']
-            },
-            'ffplay': {
-                'name': 'FFplay',
-                'icon': '⚡',
-                'description': 'Simple media player using FFmpeg libraries',
-                'features': ['Lightweight', 'Part of FFmpeg suite', 'Command-line based']
-            },
-            'windows_media_player': {
-                'name': 'Windows Media Player',
-                'icon': '🪟',
-                'description': 'Built-in Windows media player',
-                'features': ['Windows integration', 'Library management', 'Visualization']
-            }
-        }
-        
-        return player_info.get(player_executable, {
+        return self.PLAYER_INFO.get(player_executable, {
             'name': f'{player_executable.title()} Player',
             'icon': '🎵',
             'description': f'Media player: {player_executable}',
@@ -307,13 +415,64 @@ class MusicSourceDetector:
         return " ".join(info_parts)
     
     def get_source_statistics(self) -> Dict[str, int]:
-        """Get statistics about music sources used."""
-        return {
-            source_type: len([s for s in self.known_sources.values() if s.source_type == source_type])
-            for source_type in ['navidrome', 'local_file', 'stream_url', 'unknown']
-        }
+        """Get statistics about music sources used (registered sources per type)."""
+        with self._registry_lock:
+            stats = {source_type: 0 for source_type in self.STATISTIC_TYPES}
+            stats.update({t: int(totals["sources"]) for t, totals in self._type_totals.items() if totals["sources"]})
+            return stats
+    
+    def get_source_totals(self) -> Dict[str, Dict[str, float]]:
+        """Sources, plays, failures and play time per source type (over the sources still registered)."""
+        with self._registry_lock:
+            return {t: dict(totals) for t, totals in self._type_totals.items() if totals["sources"]}
+    
+    def get_source_record(self, track_path: str) -> Optional[SourceRecord]:
+        with self._registry_lock:
+            return self.known_sources.get(source_key(track_path))
     
     def register_source(self, track_path: str, source: MusicSource):
-        """Register a detected source for statistics."""
-        self.known_sources[track_path] = source
+        """Register a detected source for statistics (counts as one play)."""
+        with self._registry_lock:
+            record = self._record_for(track_path, source)
+            record.plays += 1
+            record.last_played = time.time()
+            self._type_totals[record.source.source_type]["plays"] += 1
         self.logger.info(f"Registered music source: {self.format_source_info(source)}")
+    
+    def record_play_time(self, track_path: str, seconds: float):
+        """Adds listening time to a registered source."""
+        if seconds <= 0:
+            return
+        with self._registry_lock:
+            record = self.known_sources.get(source_key(track_path))
+            if record is None:
+                return
+            record.play_seconds += seconds
+            self._type_totals[record.source.source_type]["play_seconds"] += seconds
+    
+    def record_failure(self, track_path: str, player: str = "unknown"):
+        """Counts a failed attempt to play a track."""
+        source = self.detect_source(track_path, player)
+        with self._registry_lock:
+            record = self._record_for(track_path, source)
+            record.failures += 1
+            self._type_totals[record.source.source_type]["failures"] += 1
+    
+    def _record_for(self, track_path: str, source: MusicSource) -> SourceRecord:
+        """The registry record for a path, created (and the LRU trimmed) if needed. Caller holds the lock."""
+        key = source_key(track_path)
+        record = self.known_sources.get(key)
+        if record is not None:
+            self.known_sources.move_to_end(key)
+            return record
+        record = SourceRecord(source=source)
+        self.known_sources[key] = record
+        self._type_totals[source.source_type]["sources"] += 1
+        while len(self.known_sources) > self.registry_size:
+            _, evicted = self.known_sources.popitem(last=False)
+            totals = self._type_totals[evicted.source.source_type]
+            totals["sources"] -= 1
+            totals["plays"] -= evicted.plays
+            totals["failures"] -= evicted.failures
+            totals["play_seconds"] -= evicted.play_seconds
+        return record
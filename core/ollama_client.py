@@ -0,0 +1,142 @@
+"""
+Ollama Client for Personal DJ
+
+This module talks to the local Ollama daemon over its HTTP API:
+- Requests go through the shared pooled, keep-alive HTTP transport
+- `keep_alive` hint so the model stays resident between vibes
+- Token streaming so callers can act on partial completions
+- Optional `system` prompt, kept separate so Ollama can reuse the cached prefix
+- Falls back to `ollama run` only when the daemon is unreachable
+"""
+
+import os
+import json
+import subprocess
+from typing import Iterator
+
+import requests
+from dotenv import load_dotenv
+
+from core.http_transport import HttpTransport, get_transport
+
+load_dotenv()
+
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "30"))
+
+
+class OllamaClient:
+    """Persistent HTTP client for the local Ollama API."""
+
+    CONNECT_TIMEOUT = 2  # seconds; the daemon is local, so fail fast if it's down
+
+    def __init__(self, logger, model: str, host: str = None,
+                 keep_alive: str = None, timeout: float = None,
+                 transport: HttpTransport = None):
+        self.logger = logger
+        self.model = model
+        self.host = self._normalize_host(host or OLLAMA_HOST)
+        self.keep_alive = keep_alive or OLLAMA_KEEP_ALIVE
+        self.timeout = timeout or OLLAMA_TIMEOUT
+
+        self.transport = transport or get_transport(logger)
+        # One retry only: if the daemon is down, the CLI fallback should kick in quickly.
+        self.transport.configure_host(self.host, timeout=(self.CONNECT_TIMEOUT, self.timeout), retries=1)
+        self.transport.label_host(self.host, "ollama")
+
+    @staticmethod
+    def _normalize_host(host: str) -> str:
+        """Accepts the same forms as the Ollama CLI (e.g. '127.0.0.1:11434')."""
+        host = host.strip().rstrip("/")
+        if not host.startswith(("http://", "https://")):
+            host = f"http://{host}"
+        return host
+
+    def _payload(self, prompt: str, system: str = None, stream: bool = False) -> dict:
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+        }
+        if system:
+            payload["system"] = system
+        return payload
+
+    def generate(self, prompt: str, system: str = None) -> str:
+        """Generates a completion, falling back to the CLI if the daemon is unreachable."""
+        payload = self._payload(prompt, system)
+        try:
+            response = self.transport.post(
+                f"{self.host}/api/generate",
+                json=payload,
+            )
+            response.raise_for_status()
+            return response.json().get("response", "").strip()
+        except requests.exceptions.ConnectionError as e:
+            self.logger.warning(f"Ollama daemon unreachable at {self.host} ({e}). Falling back to 'ollama run'.")
+            return self._generate_subprocess(prompt, system)
+
+    def generate_stream(self, prompt: str, system: str = None) -> Iterator[str]:
+        """Yields completion tokens as Ollama produces them."""
+        payload = self._payload(prompt, system, stream=True)
+        try:
+            response = self.transport.post(
+                f"{self.host}/api/generate",
+                json=payload,
+                stream=True,
+            )
+        except requests.exceptions.ConnectionError as e:
+            self.logger.warning(f"Ollama daemon unreachable at {self.host} ({e}). Falling back to 'ollama run'.")
+            yield self._generate_subprocess(prompt, system)
+            return
+
+        with response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(f"Ollama error: {chunk['error']}")
+                token = chunk.get("response", "")
+                if token:
+                    yield token
+                if chunk.get("done"):
+                    break
+
+    def embed(self, text: str, model: str = None) -> list:
+        """Returns the embedding vector for `text` from an Ollama embedding model."""
+        response = self.transport.post(
+            f"{self.host}/api/embed",
+            json={"model": model or self.model, "input": text, "keep_alive": self.keep_alive},
+        )
+        response.raise_for_status()
+        return response.json()["embeddings"][0]
+
+    def _generate_subprocess(self, prompt: str, system: str = None) -> str:
+        """Runs the prompt through the `ollama` CLI (slow path)."""
+        if system:
+            prompt = f"{system}\n{prompt}"  # the CLI has no separate system prompt
+        result = subprocess.run(
+            ["ollama", "run", self.model, prompt],
+            text=True, capture_output=True, check=True, timeout=self.timeout
+        )
+        return result.stdout.strip()
+
+    def warm_up(self) -> bool:
+        """Loads the model into memory so the first real request doesn't pay for it."""
+        try:
+            # An empty prompt makes Ollama load the model and return immediately.
+            response = self.transport.post(
+                f"{self.host}/api/generate",
+                json={"model": self.model, "prompt": "", "keep_alive": self.keep_alive},
+            )
+            response.raise_for_status()
+            self.logger.info(f"Ollama model '{self.model}' is loaded (keep_alive={self.keep_alive}).")
+            return True
+        except requests.exceptions.RequestException as e:
+            self.logger.warning(f"Could not warm up Ollama model '{self.model}': {e}")
+            return False
@@ -0,0 +1,89 @@
+"""
+Static Phrase Warm-up for Personal DJ
+
+The DJ personality's introduction and catchphrases are spoken over and over,
+so their audio is rendered ahead of time:
+- All static phrases are synthesized in the background when the profile loads
+- Clips live in the TTS cache, keyed by phrase text and voice
+- Editing the personality re-renders only the phrases that changed
+- The session opener can then be queued instantly
+- Clips the TTS cache has evicted since are rendered again in the background
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional
+
+
+class PhraseWarmup:
+    """Keeps rendered audio for a profile's static DJ phrases."""
+
+    PHRASE_TRAITS = ("introduction_style", "catchphrases")
+
+    def __init__(self, logger, user_profile, voice_agent):
+        self.logger = logger
+        self.user_profile = user_profile
+        self.voice_agent = voice_agent
+        self._clips: Dict[str, Optional[str]] = {}  # phrase -> audio path (None while rendering)
+        self._lock = threading.Lock()
+
+        self.user_profile.add_personality_listener(self._on_personality_changed)
+
+    def static_phrases(self) -> List[str]:
+        personality = self.user_profile.dj_personality
+        phrases = [personality.introduction_style, *personality.catchphrases]
+        return [p.strip() for p in phrases if p and p.strip()]
+
+    def start(self):
+        """Renders every static phrase that isn't ready yet, in the background."""
+        phrases = self.static_phrases()
+        with self._lock:
+            # Phrases that were removed from the personality are no longer tracked.
+            for phrase in list(self._clips):
+                if phrase not in phrases:
+                    del self._clips[phrase]
+            missing = [p for p in phrases if p not in self._clips]
+            for phrase in missing:
+                self._clips[phrase] = None
+        if missing:
+            self.logger.info(f"Phrase warm-up: rendering {len(missing)} DJ phrase(s) in the background.")
+        for phrase in missing:
+            # Submitted directly to the voice executor so cancelling stale commentary never drops them.
+            future = self.voice_agent.executor.submit(self.voice_agent.speak, phrase)
+            future.add_done_callback(lambda f, phrase=phrase: self._on_rendered(phrase, f))
+
+    def clip_for(self, phrase: str) -> Optional[str]:
+        """The rendered clip for a phrase, or None if it isn't ready."""
+        phrase = phrase.strip()
+        with self._lock:
+            path = self._clips.get(phrase)
+            if path is None or os.path.exists(path):
+                return path
+            # Evicted from the TTS cache since it was rendered.
+            del self._clips[phrase]
+        self.logger.info(f"Phrase warm-up: clip for '{phrase}' was evicted; re-rendering it.")
+        self.start()
+        return None
+
+    def intro_clip(self) -> Optional[str]:
+        """The rendered session opener, if ready."""
+        return self.clip_for(self.user_profile.dj_personality.introduction_style or "")
+
+    def _on_rendered(self, phrase: str, future):
+        try:
+            path = future.result()
+        except Exception as e:
+            self.logger.error(f"Phrase warm-up failed for '{phrase}': {e}")
+            path = None
+        with self._lock:
+            if phrase not in self._clips:
+                return  # edited away while rendering
+            if path:
+                self._clips[phrase] = path
+            else:
+                # Forget it so the next warm-up retries.
+                del self._clips[phrase]
+
+    def _on_personality_changed(self, trait: Optional[str], value):
+        if trait is None or trait in self.PHRASE_TRAITS:
+            self.start()
@@ -0,0 +1,328 @@
+"""
+Async DJ Pipeline for Personal DJ
+
+One engine behind the CLI, the GUI worker and the dispatcher loop:
+- Each vibe runs through the stages intent -> context -> LLM -> TTS -> enqueue,
+  with track resolution running alongside LLM and TTS
+- LLM, TTS and enqueue are asyncio tasks joined by bounded queues, so the first
+  sentence is voiced and queued while the LLM is still writing the next one
+- The event loop lives on its own thread; `submit` returns immediately, so the
+  input loop never blocks on a request
+- A new vibe cancels the requests still in flight, including their TTS jobs and
+  track lookup, so a stale vibe never reaches the player
+- Blocking agent calls run in worker threads, never on the event loop
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from dotenv import load_dotenv
+
+from core.metrics import metrics
+
+load_dotenv()
+
+# Speak commentary sentence by sentence while the LLM is still generating it.
+STREAM_COMMENTARY = os.getenv("DJ_STREAM_COMMENTARY", "true").lower() in ("1", "true", "yes")
+# Items buffered between two stages of one request before the upstream stage waits.
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+
+_END = object()  # end-of-stream marker passed down a stage queue
+
+
+@dataclass
+class PipelineResult:
+    """What a request ended up playing."""
+    vibe: str
+    commentary: str = ""
+    track_title: Optional[str] = None
+    track_url: Optional[str] = None
+    prefetched: bool = False
+
+
+class PipelineRequest:
+    """
+    One vibe moving through the pipeline. `on_event(event, data)` is called from
+    pipeline threads with: ("sentence", text), ("now_playing", title),
+    ("no_track", None), ("done", PipelineResult), ("cancelled", None), ("error", message).
+    """
+
+    def __init__(self, logger, vibe: str, on_event: Optional[Callable[[str, object], None]] = None):
+        self.logger = logger
+        self.vibe = vibe
+        self.on_event = on_event
+        self.result = PipelineResult(vibe)
+        self.future: Optional[Future] = None  # set by DJPipeline.submit
+        self._jobs: List[Future] = []  # TTS jobs and the track lookup, cancelled with the request
+        self.cancelled = False  # checked by player commands that were already on their way
+        self.submitted_at = time.perf_counter()
+        self._audio_queued = False
+
+    def emit(self, event: str, data=None):
+        if not self.on_event:
+            return
+        try:
+            self.on_event(event, data)
+        except Exception as e:
+            self.logger.error(f"Pipeline event handler failed on '{event}': {e}", exc_info=True)
+
+    def cancel(self):
+        """Cancels the request wherever it is in the pipeline."""
+        self.cancelled = True
+        if self.future:
+            self.future.cancel()
+
+    def wait(self, timeout: float = None) -> Optional[PipelineResult]:
+        """Blocks until the request finishes; None if it was cancelled."""
+        try:
+            return self.future.result(timeout)
+        except CancelledError:
+            return None
+
+    def mark_audio_queued(self):
+        """Records the vibe-to-first-audio span the first time audio reaches the player."""
+        if not self._audio_queued:
+            self._audio_queued = True
+            metrics.record("vibe_to_first_audio", time.perf_counter() - self.submitted_at)
+
+    def _cancel_jobs(self):
+        for job in self._jobs:
+            job.cancel()
+
+
+class DJPipeline:
+    """Runs DJ requests through async stages on a dedicated event loop thread."""
+
+    def __init__(self, logger, dispatcher, queue_size: int = None, stream: bool = None):
+        self.logger = logger
+        self.dispatcher = dispatcher
+        self.queue_size = queue_size or PIPELINE_QUEUE_SIZE
+        self.stream = STREAM_COMMENTARY if stream is None else stream
+
+        self._requests: List[PipelineRequest] = []  # in flight, oldest first
+        self._lock = threading.Lock()
+        self._playback_lock = asyncio.Lock()  # player commands from different requests never interleave
+        # Pulls LLM sentences; its futures outlive a cancelled await, so the stream is closed safely.
+        self._stream_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="dj-pipeline-llm")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="dj-pipeline", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def submit(self, vibe: str, on_event: Optional[Callable[[str, object], None]] = None) -> PipelineRequest:
+        """Starts a request for a vibe and returns at once. Requests still in flight are cancelled."""
+        request = PipelineRequest(self.logger, vibe, on_event)
+        with self._lock:
+            stale, self._requests = self._requests, [request]
+            # Flagged before the new request starts, so none of their player commands run after its own.
+            for old in stale:
+                old.cancelled = True
+            request.future = asyncio.run_coroutine_threadsafe(self._process(request), self._loop)
+        for old in stale:
+            self.logger.info(f"Pipeline: cancelling '{old.vibe}' for the new vibe.")
+            old.cancel()
+        request.future.add_done_callback(lambda _: self._forget(request))
+        return request
+
+    def in_flight(self) -> int:
+        """Number of requests currently moving through the pipeline."""
+        with self._lock:
+            return len(self._requests)
+
+    def cancel_all(self):
+        """Cancels every request in flight (e.g. when playback is stopped)."""
+        with self._lock:
+            requests, self._requests = self._requests, []
+        for request in requests:
+            request.cancel()
+
+    def shutdown(self, timeout: float = 5.0):
+        """Cancels in-flight requests and stops the event loop thread."""
+        self.cancel_all()
+        if self._loop.is_running():
+            try:
+                # Let cancelled stages unwind (and cancel their jobs) before the loop stops.
+                asyncio.run_coroutine_threadsafe(self._drain(), self._loop).result(timeout)
+            except Exception as e:
+                self.logger.warning(f"Pipeline did not wind down cleanly: {e}")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._stream_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _drain(self):
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _forget(self, request: PipelineRequest):
+        with self._lock:
+            if request in self._requests:
+                self._requests.remove(request)
+
+    async def _player_call(self, request: PipelineRequest, func, *args):
+        """
+        Runs a player command under the playback lock. It is skipped if the request was
+        cancelled before it got there; once started, the lock is held until it has finished,
+        even if the request is cancelled meanwhile, so a newer request's commands come after it.
+        """
+        def _unless_cancelled():
+            return None if request.cancelled else func(*args)
+
+        async with self._playback_lock:
+            call = asyncio.ensure_future(asyncio.to_thread(_unless_cancelled))
+            try:
+                return await asyncio.shield(call)
+            except asyncio.CancelledError:
+                await asyncio.wait({call})
+                raise
+
+    # --- Stages ---
+
+    async def _process(self, request: PipelineRequest) -> PipelineResult:
+        dj_agent = self.dispatcher.dj_agent
+        try:
+            if await self._intent_stage(request):
+                request.emit("done", request.result)
+                return request.result
+
+            prompt_parts = await self._context_stage(request)
+            # Track resolution runs alongside the LLM and TTS stages.
+            track_future = dj_agent.select_track_async(request.vibe)
+            request._jobs.append(track_future)
+
+            sentences = asyncio.Queue(self.queue_size)
+            clips = asyncio.Queue(self.queue_size)
+            await self._run_stages(
+                self._llm_stage(request, prompt_parts, sentences),
+                self._tts_stage(request, sentences, clips),
+                self._enqueue_stage(request, clips, track_future),
+            )
+            request.emit("done", request.result)
+            return request.result
+        except asyncio.CancelledError:
+            request._cancel_jobs()
+            request.emit("cancelled")
+            raise
+        except Exception as e:
+            request._cancel_jobs()
+            self.logger.error(f"Pipeline failed for '{request.vibe}': {e}", exc_info=True)
+            request.emit("error", str(e))
+            raise
+
+    async def _run_stages(self, *stages):
+        """Runs stages concurrently; if one fails or the request is cancelled, all are cancelled."""
+        tasks = [asyncio.ensure_future(stage) for stage in stages]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _intent_stage(self, request: PipelineRequest) -> bool:
+        """Plays a ready lookahead bundle for this vibe; returns True if that settled the request."""
+        dispatcher = self.dispatcher
+        self.logger.info(f"Vibe received: '{request.vibe}'. Engaging agents...")
+        bundle = await self._player_call(request, dispatcher.play_prefetched, request.vibe)
+        if bundle:
+            request.mark_audio_queued()
+            request.result.commentary = bundle.commentary
+            request.result.track_title = bundle.track_title
+            request.result.track_url = bundle.track_url
+            request.result.prefetched = True
+            request.emit("sentence", bundle.commentary)
+            request.emit("now_playing", bundle.track_title or "Unknown Track")
+            return True
+        # Anything still rendering for the previous vibe is no longer wanted.
+        dispatcher.voice_agent.cancel_pending()
+        return False
+
+    async def _context_stage(self, request: PipelineRequest):
+        """Builds the personalized prompt (and records the request in the profile)."""
+        return await asyncio.to_thread(self.dispatcher.dj_agent.build_prompt, request.vibe)
+
+    async def _llm_stage(self, request: PipelineRequest, prompt_parts, sentences: asyncio.Queue):
+        """Pulls commentary sentences from the LLM stream into the TTS queue."""
+        stream = self.dispatcher.dj_agent.commentary_stream(*prompt_parts)
+        parts = []
+        pending = None
+        try:
+            while True:
+                pending = self._stream_executor.submit(next, stream, None)
+                sentence = await asyncio.wrap_future(pending)
+                if sentence is None:
+                    break
+                parts.append(sentence)
+                request.result.commentary = " ".join(parts)
+                request.emit("sentence", sentence)
+                if self.stream:
+                    await sentences.put(sentence)
+        finally:
+            # Stops the LLM stream for a cancelled request; once any next() still running has returned,
+            # since a generator can't be closed while it's executing.
+            if pending is None:
+                stream.close()
+            else:
+                pending.add_done_callback(lambda _: stream.close())
+        if parts and not self.stream:
+            # One-shot mode voices the whole commentary as a single clip.
+            await sentences.put(request.result.commentary)
+        await sentences.put(_END)
+
+    async def _tts_stage(self, request: PipelineRequest, sentences: asyncio.Queue, clips: asyncio.Queue):
+        """Starts a TTS job per sentence; jobs render in parallel and are passed on in order."""
+        voice_agent = self.dispatcher.voice_agent
+        while True:
+            sentence = await sentences.get()
+            if sentence is _END:
+                await clips.put(_END)
+                return
+            job = voice_agent.speak_async(sentence, stream=True)
+            request._jobs.append(job)
+            await clips.put(asyncio.wrap_future(job))
+
+    async def _enqueue_stage(self, request: PipelineRequest, clips: asyncio.Queue, track_future: Future):
+        """Queues each clip as soon as it (and every clip before it) is ready, then the track."""
+        dispatcher = self.dispatcher
+        # The pre-rendered opener plays while the first sentence is still being generated.
+        replaced = await self._player_call(request, dispatcher.play_intro)
+        if replaced:
+            request.mark_audio_queued()
+
+        while True:
+            clip = await clips.get()
+            if clip is _END:
+                break
+            # wait() rather than await, so a cancelled TTS job doesn't look like our own cancellation.
+            await asyncio.wait({clip})
+            if clip.cancelled() or clip.exception() or not clip.result():
+                continue
+            # A new vibe replaces whatever was playing, once there's something to say.
+            await self._player_call(request, dispatcher.queue_commentary, clip.result(), not replaced)
+            request.mark_audio_queued()
+            replaced = True
+
+        track_title, track_url = await asyncio.to_thread(dispatcher.dj_agent.wait_for_track, track_future)
+        if not track_url:
+            self.logger.warning("No music track was selected by the DJ Agent.")
+            request.emit("no_track")
+            return
+        request.result.track_title = track_title or "Unknown Track"
+        request.result.track_url = track_url
+
+        def _start_track():
+            if not replaced:
+                dispatcher.music_agent.stop()
+            dispatcher.queue_track(request.result.track_title, track_url)
+
+        await self._player_call(request, _start_track)
+        request.mark_audio_queued()
+        request.emit("now_playing", request.result.track_title)
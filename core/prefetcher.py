@@ -0,0 +1,181 @@
+"""
+Lookahead Prefetcher for Personal DJ
+
+While a track plays, the next transition is prepared in the background:
+- Triggered once the current track passes a configurable point
+- Generates the next commentary, synthesizes its audio and resolves the next stream URL
+- The ready bundle plays instantly on skip, auto-advance or a repeat of the same vibe
+- Anything prefetched for an old vibe is thrown away when the vibe changes
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from core.commentary_cache import CommentaryCache
+
+load_dotenv()
+
+PREFETCH_AT_SECONDS = float(os.getenv("PREFETCH_AT_SECONDS", "30"))
+PREFETCH_AT_FRACTION = float(os.getenv("PREFETCH_AT_FRACTION", "0.5"))  # used once the duration is known
+AUTO_ADVANCE = os.getenv("DJ_AUTO_ADVANCE", "true").lower() in ("1", "true", "yes")
+
+
+@dataclass
+class PrefetchedTransition:
+    """Everything needed to play the next commentary + track without waiting."""
+    vibe: str
+    commentary: str
+    audio_path: Optional[str]
+    track_title: Optional[str]
+    track_url: Optional[str]
+
+
+class LookaheadPrefetcher:
+    """Prepares the next transition while the current track is playing."""
+
+    def __init__(self, logger, dj_agent, voice_agent, music_agent,
+                 trigger_seconds: float = None, trigger_fraction: float = None,
+                 auto_advance: bool = None):
+        self.logger = logger
+        self.dj_agent = dj_agent
+        self.voice_agent = voice_agent
+        self.music_agent = music_agent
+        self.trigger_seconds = trigger_seconds if trigger_seconds is not None else PREFETCH_AT_SECONDS
+        self.trigger_fraction = trigger_fraction if trigger_fraction is not None else PREFETCH_AT_FRACTION
+        self.auto_advance = auto_advance if auto_advance is not None else AUTO_ADVANCE
+
+        self.vibe = None
+        self._lock = threading.Lock()
+        self._watched_track = None  # Stream URL of the track whose progress triggers the prefetch
+        self._triggered = False
+        self._generation = 0  # Bumped on vibe change so late results from an old vibe are dropped
+        self._pending = None
+        self._bundle: Optional[PrefetchedTransition] = None
+        # Not the DJ agent's pool: respond() blocks on its own branches there, so running
+        # prefetches on it could take every worker and starve them until they time out.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lookahead")
+
+        self.music_agent.add_playback_listener(self._on_playback_event)
+
+    def set_vibe(self, vibe: str):
+        """Switches the active vibe, discarding anything prefetched for a different one."""
+        with self._lock:
+            if self.vibe is not None and self._same_vibe(vibe, self.vibe):
+                return
+            self.vibe = vibe
+            self._discard()
+
+    def watch(self, track_url: str):
+        """Starts watching a newly queued track; its progress triggers the next prefetch."""
+        with self._lock:
+            self._watched_track = track_url
+            self._triggered = False
+
+    def take(self, vibe: str) -> Optional[PrefetchedTransition]:
+        """Hands over the prefetched bundle if it was made for this vibe."""
+        with self._lock:
+            bundle = self._bundle
+            if bundle is None or not self._same_vibe(vibe, bundle.vibe):
+                return None
+            self._bundle = None
+            return bundle
+
+    def play(self, bundle: PrefetchedTransition, interrupt: bool = True):
+        """Queues a prefetched commentary + track, optionally cutting off what's playing."""
+        if interrupt:
+            self.music_agent.stop()
+        if bundle.audio_path:
+            self.music_agent.enqueue_track(bundle.audio_path)
+        if bundle.track_url:
+            self.music_agent.enqueue_track(bundle.track_url, bundle.track_title)
+            self.watch(bundle.track_url)
+
+    def advance(self, interrupt: bool = True) -> Optional[PrefetchedTransition]:
+        """Plays the prefetched transition for the current vibe, if one is ready."""
+        if self.vibe is None:
+            return None
+        bundle = self.take(self.vibe)
+        if bundle is None or not bundle.track_url:
+            return None
+        self.logger.info(f"Lookahead: playing prefetched transition to '{bundle.track_title}'.")
+        self.play(bundle, interrupt=interrupt)
+        return bundle
+
+    def shutdown(self):
+        """Drops the ready bundle and stops the lookahead worker."""
+        with self._lock:
+            self._discard()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _discard(self):
+        """Drops the ready bundle and invalidates in-flight work. Caller holds the lock."""
+        self._generation += 1
+        self._bundle = None
+        self._triggered = False
+        if self._pending:
+            self._pending.cancel()
+            self._pending = None
+
+    @staticmethod
+    def _same_vibe(a: str, b: str) -> bool:
+        return CommentaryCache.normalize_vibe(a) == CommentaryCache.normalize_vibe(b)
+
+    def _trigger_point(self) -> float:
+        """Position (seconds) at which the lookahead kicks in for the current track."""
+        duration = self.music_agent.duration
+        if duration and duration > 0:
+            return duration * self.trigger_fraction
+        return self.trigger_seconds
+
+    def _on_playback_event(self, event: str, data):
+        """Playback lifecycle hook registered with the MusicAgent."""
+        if event == "position":
+            with self._lock:
+                if (self._triggered or self.vibe is None or self._bundle is not None
+                        or self._watched_track is None
+                        or self.music_agent.current_track != self._watched_track
+                        or data < self._trigger_point()):
+                    return
+                self._triggered = True
+                generation = self._generation
+                vibe = self.vibe
+                self._pending = self.executor.submit(self._prefetch, vibe, generation)
+
+        elif event == "finished":
+            with self._lock:
+                finished_watched = data is not None and data == self._watched_track
+            if finished_watched and self.auto_advance and not self.music_agent.has_queued_tracks():
+                # Don't start the next track from the player's monitoring thread.
+                self.executor.submit(self.advance, False)
+
+        elif event == "stopped":
+            with self._lock:
+                self._watched_track = None
+
+    def _prefetch(self, vibe: str, generation: int):
+        """Builds the next transition bundle for a vibe (runs on the lookahead executor)."""
+        self.logger.info(f"Lookahead: preparing the next transition for '{vibe}'...")
+        commentary, track_title, track_url = self.dj_agent.respond(vibe, record_request=False)
+        if not track_url:
+            self.logger.warning("Lookahead: no next track available; nothing prefetched.")
+            return
+        audio_path = self.voice_agent.speak(commentary)
+
+        with self._lock:
+            if generation != self._generation:
+                self.logger.info("Lookahead: vibe changed while prefetching; discarding the result.")
+                return
+            self._bundle = PrefetchedTransition(
+                vibe=vibe,
+                commentary=commentary,
+                audio_path=audio_path,
+                track_title=track_title,
+                track_url=track_url,
+            )
+            self._pending = None
+        self.logger.info(f"Lookahead: next transition ready ('{track_title}').")
@@ -116,7 +116,7 @@ class ProfileManager:
     
     def list_profiles(self):
         """List all available profiles."""
-        profiles = UserProfile.list_profiles()
+        profiles = UserProfile.list_profile_summaries()
         
         if not profiles:
             print("No profiles found. Create one with: python -m core.profile_manager create <name>")
@@ -125,11 +125,8 @@ class ProfileManager:
         print("\n🎵 Available Personal DJ Profiles:")
         print("=" * 40)
         
-        for profile_name in profiles:
+        for profile_name, summary in profiles.items():
             try:
-                profile = UserProfile(profile_name)
-                summary = profile.get_profile_summary()
-                
                 print(f"\n📀 {summary['name']}")
                 print(f"   DJ: {summary['dj_name']} ({summary['dj_style']})")
                 print(f"   Genres: {', '.join(summary['favorite_genres'][:3]) if summary['favorite_genres'] else 'Not set'}")
@@ -138,7 +135,7 @@ class ProfileManager:
                 print(f"   Last Updated: {summary['last_updated'][:10]}")
                 
             except Exception as e:
-                print(f"\n❌ {profile_name} (Error loading: {e})")
+                print(f"\n❌ {profile_name} (Error reading summary: {e})")
     
     def export_profile(self, profile_name: str, export_path: str = None):
         """Export a profile for sharing."""
@@ -329,7 +326,7 @@ class ProfileManager:
                 return
             
             if 0 <= index < len(profile.memories):
-                deleted = profile.memories.pop(index)
+                deleted = profile.delete_memory(profile.memories[index].id)
                 print(f"✅ Deleted memory: {deleted.content[:50]}...")
             else:
                 print("Invalid memory number.")
@@ -0,0 +1,136 @@
+"""
+Profile Manifest for Personal DJ
+
+Lists profiles without loading every one of them:
+- `profiles/manifest.json` holds each profile's summary and is updated
+  whenever a profile is saved
+- Each entry remembers the size and mtime of its profile file. An entry that
+  doesn't match the file on disk is stale and is rebuilt from the profile itself
+- Interactions logged since the last save are read from the event log tail, so
+  busy profiles don't need a full reload to show their session count
+- Entries for deleted profiles are dropped
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.interaction_log import InteractionLog
+
+MANIFEST_NAME = "manifest.json"
+
+# One lock per process; concurrent writers in other processes can at worst drop
+# an entry, which is rebuilt on the next listing.
+_manifest_lock = threading.Lock()
+
+
+def file_signature(path: Path) -> Optional[List[int]]:
+    """[mtime_ns, size] of a file, or None if it doesn't exist."""
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class ProfileManifest:
+    """Cached profile summaries in `<profile_dir>/manifest.json`."""
+
+    def __init__(self, profile_dir: Path):
+        self.profile_dir = Path(profile_dir)
+        self.path = self.profile_dir / MANIFEST_NAME
+
+    def profile_file(self, name: str) -> Path:
+        return self.profile_dir / f"{name}.json"
+
+    def events_file(self, name: str) -> Path:
+        return self.profile_dir / f"{name}.events.jsonl"
+
+    def record(self, name: str, summary: Dict[str, Any], last_event_seq: int,
+               events_signature: Optional[List[int]]):
+        """
+        Stores a profile's summary. `events_signature` must be taken before the
+        summary was computed, so events appended in between are picked up later.
+        """
+        entry = {
+            "summary": summary,
+            "profile_file": file_signature(self.profile_file(name)),
+            "last_event_seq": last_event_seq,
+            "events_file": events_signature,
+        }
+        with _manifest_lock:
+            entries = self._read()
+            entries[name] = entry
+            self._write(entries)
+
+    def summaries(self, names: List[str],
+                  rebuild: Callable[[str], Tuple[Dict[str, Any], int]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Summaries for every profile on disk (`names`), in order. `rebuild(name)` loads a
+        profile and returns (summary, last_event_seq); it's only called for stale entries.
+        """
+        with _manifest_lock:
+            entries = self._read()
+        changed = set(entries) - set(names)  # deleted profiles
+        results = {}
+
+        for name in names:
+            entry = entries.get(name)
+            if entry is None or entry.get("profile_file") != file_signature(self.profile_file(name)):
+                events_signature = file_signature(self.events_file(name))
+                try:
+                    summary, last_event_seq = rebuild(name)
+                except Exception as e:
+                    print(f"Error rebuilding manifest entry for '{name}': {e}")
+                    continue
+                entry = {
+                    "summary": summary,
+                    "profile_file": file_signature(self.profile_file(name)),
+                    "last_event_seq": last_event_seq,
+                    "events_file": events_signature,
+                }
+                changed.add(name)
+            elif entry.get("events_file") != file_signature(self.events_file(name)):
+                self._apply_event_tail(name, entry)
+                changed.add(name)
+            entries[name] = entry
+            results[name] = entry["summary"]
+
+        if changed:
+            with _manifest_lock:
+                on_disk = {name: e for name, e in self._read().items() if name in names}
+                on_disk.update({name: entries[name] for name in changed if name in names})
+                self._write(on_disk)
+        return results
+
+    def _apply_event_tail(self, name: str, entry: Dict[str, Any]):
+        """Folds interactions logged after the summary was taken into it."""
+        events_signature = file_signature(self.events_file(name))
+        summary = entry["summary"]
+        for event in InteractionLog(self.events_file(name)).read_since(entry.get("last_event_seq", 0)):
+            summary["total_sessions"] = summary.get("total_sessions", 0) + 1
+            summary["last_updated"] = event.get("time", summary.get("last_updated"))
+            entry["last_event_seq"] = event["seq"]
+        entry["events_file"] = events_signature
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("profiles", {})
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Profile manifest unreadable, rebuilding: {e}")
+            return {}
+
+    def _write(self, entries: Dict[str, Dict[str, Any]]):
+        try:
+            self.profile_dir.mkdir(exist_ok=True)
+            temp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"profiles": entries}, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Error writing profile manifest: {e}")
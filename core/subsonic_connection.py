@@ -0,0 +1,46 @@
+"""
+Navidrome Connection for Personal DJ
+
+A `libsonic.Connection` whose API calls go through the shared HTTP transport
+instead of a fresh urllib connection per request:
+- Keep-alive connection reuse to the Navidrome server
+- The transport's retry/backoff, timeouts and concurrency limit
+- URL building (e.g. `getStreamUrl`) stays local to libsonic
+"""
+
+# libsonic is not available on Windows, so we'll guard the import.
+try:
+    import libsonic
+except ImportError:
+    libsonic = None
+
+from core.http_transport import HttpTransport
+
+
+if libsonic:
+
+    class TransportConnection(libsonic.Connection):
+        """libsonic connection that sends its info requests through an HttpTransport."""
+
+        def __init__(self, transport: HttpTransport, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.transport = transport
+            self._host_labelled = False
+
+        def _doInfoReq(self, req):
+            # `req` is the urllib Request libsonic built (form-encoded POST, or GET with a query string).
+            if not self._host_labelled:
+                self.transport.label_host(req.full_url, "navidrome")
+                self._host_labelled = True
+            headers = dict(req.header_items())
+            if req.data is not None:
+                # urllib would add this itself when opening the request.
+                headers.setdefault("Content-type", "application/x-www-form-urlencoded")
+            # Every Subsonic call we make is a read, so POSTs get the full retry policy too.
+            response = self.transport.request(req.get_method(), req.full_url, data=req.data, headers=headers,
+                                              idempotent=True)
+            response.raise_for_status()
+            return response.json()["subsonic-response"]
+
+else:
+    TransportConnection = None
@@ -0,0 +1,40 @@
+"""
+Text Streaming Helpers for Personal DJ
+
+Turns a stream of LLM tokens into speakable chunks so TTS can start on the
+first sentence while the rest of the commentary is still being generated.
+"""
+
+import re
+from typing import Iterable, Iterator
+
+
+# End of sentence: terminal punctuation, optional closing quotes/brackets, then whitespace.
+_SENTENCE_END = re.compile(r'[.!?…]+["\')\]”’]*\s+')
+
+# Fragments shorter than this are merged into the next sentence, so abbreviations
+# like "Mr." or a lone "Yeah!" don't become separate TTS calls.
+MIN_SENTENCE_CHARS = 20
+
+
+def split_sentences(tokens: Iterable[str], min_chars: int = MIN_SENTENCE_CHARS) -> Iterator[str]:
+    """Groups streamed tokens into sentences, yielding each as soon as it is complete."""
+    buffer = ""
+    for token in tokens:
+        buffer += token
+        while True:
+            boundary = None
+            for match in _SENTENCE_END.finditer(buffer):
+                if match.end() >= min_chars:
+                    boundary = match
+                    break
+            if boundary is None:
+                break
+            sentence = buffer[:boundary.end()].strip()
+            buffer = buffer[boundary.end():]
+            if sentence:
+                yield sentence
+
+    tail = buffer.strip()
+    if tail:
+        yield tail
@@ -0,0 +1,149 @@
+"""
+Random Track Pool for Personal DJ
+
+Keeps a batch of random Navidrome songs in memory so picking the next track
+costs no network round-trip:
+- Fetched with `getRandomSongs` in batches of 50-500
+- Topped up in the background when it drops below a low-water mark
+- Recently played songs are skipped
+- Hit/miss/refill counters for monitoring
+"""
+
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TRACK_POOL_SIZE = int(os.getenv("TRACK_POOL_SIZE", "200"))
+TRACK_POOL_LOW_WATER = int(os.getenv("TRACK_POOL_LOW_WATER", "50"))
+TRACK_POOL_RECENT = int(os.getenv("TRACK_POOL_RECENT", "100"))
+
+# getRandomSongs accepts at most 500 songs per call.
+MIN_BATCH, MAX_BATCH = 50, 500
+
+
+class TrackPool:
+    """Refillable in-memory pool of random songs from Navidrome."""
+
+    def __init__(self, logger, client, batch_size: int = None, low_water: int = None,
+                 recent_window: int = None, executor=None):
+        self.logger = logger
+        self.client = client
+        self.batch_size = max(MIN_BATCH, min(MAX_BATCH, batch_size or TRACK_POOL_SIZE))
+        self.low_water = low_water if low_water is not None else TRACK_POOL_LOW_WATER
+        self.executor = executor
+
+        self._songs = deque()
+        self._pool_ids = set()
+        self._recent = deque(maxlen=recent_window or TRACK_POOL_RECENT)
+        self._lock = threading.Lock()
+        self._refilling = False
+
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.skipped_recent = 0
+
+    def take(self) -> Optional[Dict[str, Any]]:
+        """Returns a song that hasn't been played recently, refilling inline only if the pool is dry."""
+        song = self._pop()
+        if song is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.logger.info("Track pool empty; fetching a batch from Navidrome...")
+            self.refill()
+            song = self._pop()
+
+        if self.size() < self.low_water:
+            self.refill_async()
+        return song
+
+    def mark_played(self, song_id: str):
+        """Remembers a song as recently played so the pool skips it for a while."""
+        with self._lock:
+            self._recent.append(song_id)
+
+    def recent_ids(self) -> List[str]:
+        """IDs of recently played songs (oldest first)."""
+        with self._lock:
+            return list(self._recent)
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._songs)
+
+    def refill(self) -> int:
+        """Fetches one batch from Navidrome and adds the songs not already pooled or recently played."""
+        try:
+            result = self.client.getRandomSongs(size=self.batch_size)
+            songs = result.get("randomSongs", {}).get("song") or []
+            if isinstance(songs, dict):
+                songs = [songs]
+        except Exception as e:
+            self.logger.error(f"Track pool refill failed: {e}")
+            return 0
+
+        added = 0
+        with self._lock:
+            recent = set(self._recent)
+            for song in songs:
+                song_id = song.get("id")
+                if not song_id or song_id in self._pool_ids or song_id in recent:
+                    continue
+                self._songs.append(song)
+                self._pool_ids.add(song_id)
+                added += 1
+            self.refills += 1
+        self.logger.info(f"Track pool refilled with {added} songs ({self.size()} available).")
+        return added
+
+    def refill_async(self):
+        """Tops up the pool in the background; at most one refill runs at a time."""
+        with self._lock:
+            if self._refilling:
+                return
+            self._refilling = True
+
+        def _run():
+            try:
+                self.refill()
+            finally:
+                with self._lock:
+                    self._refilling = False
+
+        if self.executor:
+            self.executor.submit(_run)
+        else:
+            threading.Thread(target=_run, name="track-pool-refill", daemon=True).start()
+
+    def stats(self) -> Dict[str, int]:
+        """Returns pool counters for display and monitoring."""
+        with self._lock:
+            return {
+                "available": len(self._songs),
+                "batch_size": self.batch_size,
+                "low_water": self.low_water,
+                "hits": self.hits,
+                "misses": self.misses,
+                "refills": self.refills,
+                "skipped_recent": self.skipped_recent,
+            }
+
+    def _pop(self) -> Optional[Dict[str, Any]]:
+        """Pops the next pooled song that wasn't played recently and marks it played."""
+        with self._lock:
+            recent = set(self._recent)
+            while self._songs:
+                song = self._songs.popleft()
+                self._pool_ids.discard(song["id"])
+                if song["id"] in recent:
+                    self.skipped_recent += 1
+                    continue
+                self._recent.append(song["id"])
+                return song
+            return None
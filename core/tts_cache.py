@@ -0,0 +1,151 @@
+"""
+TTS Audio Cache for Personal DJ
+
+Synthesized commentary is stored on disk and reused instead of re-rendered:
+- Content-addressed by a hash of the text, voice, model and TTS engine
+- LRU eviction once the directory grows past a size cap
+- Atomic writes (temp file + rename), so a crash never leaves a partial clip
+- Hit/miss/eviction counters
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "cache/tts")
+TTS_CACHE_MAX_MB = float(os.getenv("TTS_CACHE_MAX_MB", "200"))
+
+TEMP_PREFIX = "tmp-"
+
+
+class TTSCache:
+    """Size-bounded, content-addressed directory of synthesized audio clips."""
+
+    def __init__(self, logger, cache_dir: str = None, max_bytes: int = None):
+        self.logger = logger
+        self.cache_dir = Path(cache_dir or TTS_CACHE_DIR)
+        self.max_bytes = max_bytes or int(TTS_CACHE_MAX_MB * 1024 * 1024)
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # file name -> size, oldest first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def make_key(text: str, voice_id: str, model_id: str, engine: str) -> str:
+        """Hashes everything that changes the rendered audio."""
+        material = "\x1f".join([engine or "", voice_id or "", model_id or "", text.strip()])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str, ext: str = "mp3") -> str:
+        return str(self.cache_dir / f"{key}.{ext}")
+
+    def get(self, key: str, ext: str = "mp3") -> Optional[str]:
+        """Returns the cached clip's path, or None on a miss."""
+        name = f"{key}.{ext}"
+        path = self.cache_dir / name
+        with self._lock:
+            if name not in self._entries or not path.exists():
+                self._forget(name)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+        try:
+            os.utime(path)  # keeps LRU order across restarts
+        except OSError:
+            pass
+        return str(path)
+
+    def temp_path(self, ext: str = "mp3") -> str:
+        """A scratch path inside the cache dir for writers that need a file name (e.g. pyttsx3)."""
+        return str(self.cache_dir / f"{TEMP_PREFIX}{uuid.uuid4().hex}.{ext}")
+
+    def put_bytes(self, key: str, data: bytes, ext: str = "mp3") -> str:
+        """Atomically stores a clip's bytes and returns its cached path."""
+        temp_path = self.temp_path(ext)
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        return self.put_file(key, temp_path, ext)
+
+    def put_file(self, key: str, temp_path: str, ext: str = "mp3") -> str:
+        """Moves a finished file (ideally from `temp_path`) into the cache and returns its path."""
+        name = f"{key}.{ext}"
+        final_path = self.cache_dir / name
+        os.replace(temp_path, final_path)
+        size = final_path.stat().st_size
+        with self._lock:
+            self._forget(name)
+            self._entries[name] = size
+            self._total_bytes += size
+            self._evict()
+        return str(final_path)
+
+    def discard_temp(self, temp_path: str):
+        """Removes a scratch file after a failed render."""
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, float]:
+        """Returns cache counters for display and monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def _load(self):
+        """Indexes clips left by earlier runs (oldest use first) and clears stale scratch files."""
+        files = []
+        for path in self.cache_dir.iterdir():
+            if not path.is_file():
+                continue
+            if path.name.startswith(TEMP_PREFIX):
+                self.discard_temp(str(path))
+                continue
+            stat = path.stat()
+            files.append((stat.st_mtime, path.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total_bytes += size
+        with self._lock:
+            self._evict()
+        if files:
+            self.logger.info(f"TTS cache: {len(self._entries)} clips ({self._total_bytes / 1_048_576:.1f} MB) in {self.cache_dir}")
+
+    def _forget(self, name: str):
+        """Drops an entry from the index. Caller holds the lock."""
+        size = self._entries.pop(name, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        """Deletes least recently used clips until under the size cap. Caller holds the lock."""
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self.cache_dir / name)
+            except OSError as e:
+                # Typically a clip the player still has open on Windows; it'll go next time.
+                self.logger.warning(f"TTS cache: could not evict {name}: {e}")
+            self.evictions += 1
@@ -0,0 +1,78 @@
+"""
+Local TTS Worker Pool for Personal DJ
+
+`pyttsx3` blocks while it renders and its engine must not be shared across
+threads, so local synthesis runs in a small pool of worker processes:
+- Each worker process creates and owns one `pyttsx3` engine
+- Jobs are queued and return futures, so callers never block on rendering
+- Several sentences render in parallel across the pool
+- Jobs that haven't started yet can be cancelled (e.g. stale commentary)
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOCAL_TTS_WORKERS = int(os.getenv("LOCAL_TTS_WORKERS", "2"))
+
+# Set in each worker process by the pool initializer.
+_engine = None
+
+
+def _init_worker():
+    global _engine
+    import pyttsx3
+    _engine = pyttsx3.init()
+
+
+def _describe_engine() -> Tuple[str, str]:
+    """Voice and rate of the worker's engine (they change the rendered audio)."""
+    return str(_engine.getProperty("voice")), str(_engine.getProperty("rate"))
+
+
+def _render(text: str, output_path: str) -> str:
+    _engine.save_to_file(text, output_path)
+    _engine.runAndWait()
+    return output_path
+
+
+class LocalTTSPool:
+    """Process pool that renders text to audio files with pyttsx3."""
+
+    def __init__(self, logger, workers: int = None):
+        self.logger = logger
+        self.workers = max(1, workers or LOCAL_TTS_WORKERS)
+        self.voice_id = None
+        self.rate = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self, timeout: float = 30):
+        """Starts the workers and checks that an engine can be created; raises if not."""
+        # spawn, not fork: the parent already runs several threads (DJ agent pool, library sync,
+        # mpv reader) whose locks a forked child could inherit held.
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        try:
+            self.voice_id, self.rate = self._executor.submit(_describe_engine).result(timeout=timeout)
+        except Exception:
+            self.shutdown()
+            raise
+        self.logger.info(f"Local TTS: {self.workers} worker process(es) ready.")
+
+    def submit(self, text: str, output_path: str) -> Future:
+        """Queues a render job; the future resolves to `output_path`."""
+        if self._executor is None:
+            raise RuntimeError("Local TTS pool is not running.")
+        return self._executor.submit(_render, text, output_path)
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -3,19 +3,27 @@ User Profile Management System for Personal DJ
 
 This module handles user profiles that contain:
 - Personal preferences (music genres, moods, energy levels)
-- Interaction history and learned behaviors
+- Interaction history and learned behaviors (appended to an event log and
+  periodically compacted into rolling aggregates)
 - Personal memories and notes
 - DJ personality customizations
 - Exportable/importable profile data
+- Debounced, atomic write-behind saves
 """
 
 import json
 import os
 import datetime
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 from pathlib import Path
 
+from core.interaction_log import InteractionLog
+from core.write_behind import WriteBehind
+from core.memory_index import MemoryIndex
+from core.memory_embeddings import MemoryEmbeddings, embeddings_available
+from core.profile_manifest import MANIFEST_NAME, ProfileManifest, file_signature
+
 
 @dataclass
 class MusicPreferences:
@@ -70,10 +78,22 @@ class InteractionHistory:
 class UserProfile:
     """Complete user profile management."""
     
+    # Rolling window kept for each interaction list when events are compacted.
+    INTERACTION_WINDOW = 200
+    # Logged events folded into the profile snapshot at a time.
+    COMPACT_EVERY = 500
+    # Seconds to coalesce profile changes before writing them out.
+    SAVE_DEBOUNCE = 2.0
+    
     def __init__(self, profile_name: str = "default"):
         self.profile_name = profile_name
         self.profile_dir = Path("profiles")
         self.profile_file = self.profile_dir / f"{profile_name}.json"
+        self.event_log = InteractionLog(self.profile_dir / f"{profile_name}.events.jsonl")
+        self.manifest = ProfileManifest(self.profile_dir)
+        self._event_seq = 0  # Sequence number of the last interaction event applied
+        self._events_since_compaction = 0
+        self._persister = WriteBehind(self._write_snapshot, self.SAVE_DEBOUNCE, name=f"profile-{profile_name}")
         
         # Initialize default profile data
         self.music_preferences = MusicPreferences(
@@ -98,6 +118,9 @@ class UserProfile:
         )
         
         self.memories: List[UserMemory] = []
+        self.memory_index = MemoryIndex()
+        self._memory_embeddings = None  # created on first use (needs NumPy)
+        self._embeddings_version = -1  # context version the embeddings were last synced at
         self.interaction_history = InteractionHistory(
             total_sessions=0,
             favorite_request_types=[],
@@ -112,6 +135,10 @@ class UserProfile:
         self.created_date = datetime.datetime.now().isoformat()
         self.last_updated = datetime.datetime.now().isoformat()
         self.version = "1.0"
+        self._personality_listeners: List[Callable[[Optional[str], Any], None]] = []
+        # Bumped by every change that can affect the prompt context; cached prefix is (version, text).
+        self._context_version = 0
+        self._prefix_cache: Optional[Tuple[int, str]] = None
         
         # Load existing profile if it exists
         self.load_profile()
@@ -123,6 +150,10 @@ class UserProfile:
             tags = []
         
         memory_id = f"mem_{len(self.memories)}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        suffix = 1
+        while memory_id in self.memory_index:  # possible after a deletion
+            memory_id = f"mem_{len(self.memories) + suffix}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            suffix += 1
         memory = UserMemory(
             id=memory_id,
             content=content,
@@ -134,44 +165,106 @@ class UserProfile:
         )
         
         self.memories.append(memory)
-        self.last_updated = datetime.datetime.now().isoformat()
+        self.memory_index.add(memory)
+        self._touch()
         return memory_id
     
+    def delete_memory(self, memory_id: str) -> Optional[UserMemory]:
+        """Delete a memory by ID. Returns the deleted memory, or None if it doesn't exist."""
+        memory = self.memory_index.get(memory_id)
+        if memory is None:
+            return None
+        self.memory_index.remove(memory_id)
+        self.memories.remove(memory)
+        self._touch()
+        return memory
+    
     def get_memories_by_category(self, category: str) -> List[UserMemory]:
-        """Retrieve memories by category."""
-        return [mem for mem in self.memories if mem.category == category]
+        """Retrieve memories by category, most important and most recent first."""
+        return self.memory_index.by_category(category)
     
     def get_memories_by_importance(self, min_importance: int = 3) -> List[UserMemory]:
-        """Get memories above a certain importance level."""
-        return [mem for mem in self.memories if mem.importance >= min_importance]
+        """Get memories above a certain importance level, most important and most recent first."""
+        return self.memory_index.by_importance(min_importance)
     
     def search_memories(self, query: str) -> List[UserMemory]:
-        """Search memories by content or tags."""
-        query_lower = query.lower()
-        results = []
+        """Search memories by content or tags (word prefixes), ranked by importance and recency."""
+        results = self.memory_index.search(query)
         
-        for memory in self.memories:
-            if (query_lower in memory.content.lower() or 
-                any(query_lower in tag.lower() for tag in memory.tags)):
-                memory.last_referenced = datetime.datetime.now().isoformat()
-                results.append(memory)
+        now = datetime.datetime.now().isoformat()
+        for memory in results:
+            memory.last_referenced = now
         
+        if results:
+            self._invalidate_context()  # recency breaks ties in the prompt's memory ranking
+            self._persister.mark_dirty()
         return results
     
     def update_music_preference(self, preference_type: str, value: Any):
         """Update a specific music preference."""
         if hasattr(self.music_preferences, preference_type):
             setattr(self.music_preferences, preference_type, value)
-            self.last_updated = datetime.datetime.now().isoformat()
+            self._touch()
     
     def update_dj_personality(self, trait: str, value: Any):
         """Update DJ personality trait."""
         if hasattr(self.dj_personality, trait):
             setattr(self.dj_personality, trait, value)
-            self.last_updated = datetime.datetime.now().isoformat()
+            self._touch()
+            self._notify_personality_listeners(trait, value)
+    
+    def _touch(self):
+        """Marks the profile changed; the write-behind persister saves it shortly."""
+        self.last_updated = datetime.datetime.now().isoformat()
+        self._invalidate_context()
+        self._persister.mark_dirty()
+    
+    def _invalidate_context(self):
+        """Marks the memoized prompt context stale."""
+        self._context_version += 1
+    
+    def flush(self):
+        """Writes any pending changes now (call on shutdown)."""
+        self._persister.flush()
+    
+    def add_personality_listener(self, listener: Callable[[Optional[str], Any], None]):
+        """
+        Registers a callback for DJ personality edits, called with (trait, value).
+        The trait is None when the whole personality was replaced (e.g. on import).
+        """
+        self._personality_listeners.append(listener)
+    
+    def _notify_personality_listeners(self, trait: Optional[str], value: Any):
+        for listener in self._personality_listeners:
+            try:
+                listener(trait, value)
+            except Exception as e:
+                print(f"Error in personality listener: {e}")
     
     def record_interaction(self, interaction_type: str, data: Dict[str, Any]):
-        """Record user interaction for learning."""
+        """Record user interaction for learning (appended to the event log, not a full save)."""
+        self._event_seq += 1
+        event = {
+            "seq": self._event_seq,
+            "type": interaction_type,
+            "data": data,
+            "time": datetime.datetime.now().isoformat(),
+        }
+        self._apply_interaction(interaction_type, data)
+        self.last_updated = event["time"]
+        
+        try:
+            self.event_log.append(event)
+        except OSError as e:
+            print(f"Error logging interaction: {e}")
+            return
+        
+        self._events_since_compaction += 1
+        if self._events_since_compaction >= self.COMPACT_EVERY:
+            self.compact_interactions()
+    
+    def _apply_interaction(self, interaction_type: str, data: Dict[str, Any]):
+        """Folds one interaction event into the in-memory history."""
         self.interaction_history.total_sessions += 1
         
         # Update interaction patterns based on type
@@ -182,14 +275,60 @@ class UserProfile:
         elif interaction_type == "positive_feedback":
             if "keywords" in data:
                 self.interaction_history.positive_feedback_keywords.extend(data["keywords"])
+                self._invalidate_context()  # the only interaction the prompt context reads
         elif interaction_type == "negative_feedback":
             if "keywords" in data:
                 self.interaction_history.negative_feedback_keywords.extend(data["keywords"])
+    
+    def compact_interactions(self):
+        """Trims interaction lists to their rolling window, snapshots the profile and empties the event log."""
+        history = self.interaction_history
+        window = self.INTERACTION_WINDOW
+        for name in ("most_played_tracks", "skip_patterns", "session_durations",
+                     "positive_feedback_keywords", "negative_feedback_keywords"):
+            values = getattr(history, name)
+            if len(values) > window:
+                setattr(history, name, values[-window:])
         
-        self.last_updated = datetime.datetime.now().isoformat()
+        # The snapshot records the last folded sequence number, so a crash before
+        # the truncate just means those events are skipped on the next load.
+        self.save_profile()
+        try:
+            self.event_log.truncate()
+        except OSError as e:
+            print(f"Error compacting interaction log: {e}")
+            return
+        self._events_since_compaction = 0
+    
+    def get_relevant_memories(self, text: str, k: int = 3) -> List[UserMemory]:
+        """The k memories most similar to `text` by embedding; empty if NumPy isn't available."""
+        embeddings = self._get_memory_embeddings()
+        if embeddings is None or not self.memories:
+            return []
+        # Memories can only have changed if the context version moved.
+        if self._embeddings_version != self._context_version:
+            if embeddings.sync(self.memories):
+                self._persister.mark_dirty()
+            self._embeddings_version = self._context_version
+        memories = [self.memory_index.get(memory_id) for memory_id in embeddings.top_k(text, k)]
+        return [mem for mem in memories if mem is not None]
+    
+    def _get_memory_embeddings(self) -> Optional[MemoryEmbeddings]:
+        if self._memory_embeddings is None and embeddings_available():
+            self._memory_embeddings = MemoryEmbeddings(self.profile_dir / f"{self.profile_name}.embeddings.npz")
+        return self._memory_embeddings
     
-    def get_personalized_prompt_context(self) -> str:
-        """Generate context for DJ prompts based on user profile."""
+    def get_system_prompt_prefix(self) -> str:
+        """
+        The stable part of the DJ prompt: personality, preferences, important memories
+        and feedback. Memoized until the profile changes, so it is byte-identical across
+        requests and the LLM can reuse its prompt cache.
+        """
+        cached = self._prefix_cache
+        if cached is not None and cached[0] == self._context_version:
+            return cached[1]
+        
+        version = self._context_version
         context_parts = []
         
         # Add DJ personality
@@ -203,21 +342,45 @@ class UserProfile:
             context_parts.append(f"The user dislikes: {', '.join(self.music_preferences.disliked_genres)}.")
         
         # Add important memories
-        important_memories = self.get_memories_by_importance(4)
+        important_memories = self.memory_index.top(3, min_importance=4)
         if important_memories:
-            memory_texts = [mem.content for mem in important_memories[:3]]  # Top 3 most important
+            memory_texts = [mem.content for mem in important_memories]  # Top 3 most important
             context_parts.append(f"Remember these important things about the user: {'; '.join(memory_texts)}.")
         
-        # Add interaction patterns
+        # Add interaction patterns (de-duplicated in order, so the text is stable across runs)
         if self.interaction_history.positive_feedback_keywords:
-            recent_positive = list(set(self.interaction_history.positive_feedback_keywords[-10:]))
+            recent_positive = list(dict.fromkeys(self.interaction_history.positive_feedback_keywords[-10:]))
             context_parts.append(f"The user responds positively to: {', '.join(recent_positive)}.")
         
-        return " ".join(context_parts)
+        prefix = " ".join(context_parts)
+        self._prefix_cache = (version, prefix)
+        return prefix
+    
+    def get_request_prompt_context(self, vibe: str = None) -> str:
+        """The per-request part of the DJ prompt: memories relevant to this vibe."""
+        if not vibe:
+            return ""
+        important_ids = {mem.id for mem in self.memory_index.top(3, min_importance=4)}
+        relevant_memories = [mem for mem in self.get_relevant_memories(vibe, 3) if mem.id not in important_ids]
+        if not relevant_memories:
+            return ""
+        memory_texts = [mem.content for mem in relevant_memories]
+        return f"Remember these things about the user that fit this request: {'; '.join(memory_texts)}."
+    
+    def get_personalized_prompt_context(self, vibe: str = None) -> str:
+        """Generate context for DJ prompts based on user profile (and the requested vibe, if given)."""
+        request_context = self.get_request_prompt_context(vibe)
+        prefix = self.get_system_prompt_prefix()
+        return f"{prefix} {request_context}" if request_context else prefix
     
     def save_profile(self):
-        """Save profile to JSON file."""
+        """Save profile to JSON file now (pending debounced changes included)."""
+        self._persister.flush(force=True)
+    
+    def _write_snapshot(self):
+        """Atomically writes the profile snapshot (temp file + rename) and updates the manifest."""
         self.profile_dir.mkdir(exist_ok=True)
+        events_signature = file_signature(self.event_log.path)
         
         profile_data = {
             "profile_name": self.profile_name,
@@ -227,17 +390,36 @@ class UserProfile:
             "interaction_history": asdict(self.interaction_history),
             "created_date": self.created_date,
             "last_updated": self.last_updated,
-            "version": self.version
+            "version": self.version,
+            "last_event_seq": self._event_seq
         }
         
-        with open(self.profile_file, 'w', encoding='utf-8') as f:
-            json.dump(profile_data, f, indent=2, ensure_ascii=False)
+        temp_file = self.profile_file.with_name(self.profile_file.name + ".tmp")
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(profile_data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_file, self.profile_file)
+        self.manifest.record(self.profile_file.stem, self.get_profile_summary(), self._event_seq, events_signature)
+        
+        if self._memory_embeddings is not None:
+            self._memory_embeddings.save()
     
     def load_profile(self):
-        """Load profile from JSON file."""
-        if not self.profile_file.exists():
-            return
-        
+        """Load the profile snapshot, then replay interaction events logged after it."""
+        if self.profile_file.exists():
+            self._load_snapshot()
+        self._replay_event_log()
+    
+    def _replay_event_log(self):
+        try:
+            for event in self.event_log.read_since(self._event_seq):
+                self._apply_interaction(event.get("type", ""), event.get("data") or {})
+                self._event_seq = event["seq"]
+                self.last_updated = event.get("time", self.last_updated)
+                self._events_since_compaction += 1
+        except OSError as e:
+            print(f"Error reading interaction log: {e}")
+    
+    def _load_snapshot(self):
         try:
             with open(self.profile_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
@@ -246,6 +428,8 @@ class UserProfile:
             self.created_date = data.get("created_date", self.created_date)
             self.last_updated = data.get("last_updated", self.last_updated)
             self.version = data.get("version", self.version)
+            self._event_seq = data.get("last_event_seq", 0)
+            self._invalidate_context()
             
             # Load music preferences
             if "music_preferences" in data:
@@ -258,6 +442,7 @@ class UserProfile:
             # Load memories
             if "memories" in data:
                 self.memories = [UserMemory(**mem_data) for mem_data in data["memories"]]
+                self.memory_index.rebuild(self.memories)
             
             # Load interaction history
             if "interaction_history" in data:
@@ -301,7 +486,9 @@ class UserProfile:
                 self.music_preferences = MusicPreferences(**data["music_preferences"])
                 self.dj_personality = DJPersonality(**data["dj_personality"])
                 self.memories = [UserMemory(**mem_data) for mem_data in data["memories"]]
+                self.memory_index.rebuild(self.memories)
                 self.created_date = data.get("created_date", self.created_date)
+                self._notify_personality_listeners(None, self.dj_personality)
             else:
                 # Merge mode - combine memories and preferences
                 imported_memories = [UserMemory(**mem_data) for mem_data in data["memories"]]
@@ -309,7 +496,10 @@ class UserProfile:
                 
                 for mem in imported_memories:
                     if mem.content not in existing_contents:
+                        while mem.id in self.memory_index:
+                            mem.id = f"{mem.id}_imported"
                         self.memories.append(mem)
+                        self.memory_index.add(mem)
                 
                 # Merge preferences (imported ones take priority)
                 imported_prefs = MusicPreferences(**data["music_preferences"])
@@ -321,6 +511,7 @@ class UserProfile:
                 ))
             
             self.last_updated = datetime.datetime.now().isoformat()
+            self._invalidate_context()
             self.save_profile()
             return True
             
@@ -335,7 +526,17 @@ class UserProfile:
         if not profile_dir.exists():
             return []
         
-        return [f.stem for f in profile_dir.glob("*.json")]
+        return sorted(f.stem for f in profile_dir.glob("*.json") if f.name != MANIFEST_NAME)
+    
+    @classmethod
+    def list_profile_summaries(cls) -> Dict[str, Dict[str, Any]]:
+        """Summaries of all profiles from the manifest; only stale entries load their profile."""
+        return ProfileManifest(Path("profiles")).summaries(cls.list_profiles(), cls._load_summary)
+    
+    @classmethod
+    def _load_summary(cls, profile_name: str):
+        profile = cls(profile_name)
+        return profile.get_profile_summary(), profile._event_seq
     
     def get_profile_summary(self) -> Dict[str, Any]:
         """Get a summary of the profile for display."""
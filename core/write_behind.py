@@ -0,0 +1,73 @@
+"""
+Write-Behind Persistence for Personal DJ
+
+Coalesces many "this changed" marks into one background write:
+- The first mark schedules a write after a debounce window; later marks ride along
+- Writes run on a timer thread, so callers never pay for serialization inline
+- `flush()` writes pending changes immediately (used on save and shutdown)
+- Pending changes are flushed at interpreter exit as a safety net
+"""
+
+import atexit
+import threading
+from typing import Callable
+
+
+class WriteBehind:
+    """Debounced background writer around a `write` callable."""
+
+    def __init__(self, write: Callable[[], None], delay: float, logger=None, name: str = "write-behind"):
+        self._write = write
+        self.delay = delay
+        self.logger = logger
+        self.name = name
+        self._dirty = False
+        self._timer = None
+        self._lock = threading.Lock()  # guards _dirty/_timer
+        self._write_lock = threading.Lock()  # one write at a time
+        self._atexit_registered = False
+
+    def mark_dirty(self):
+        """Schedules a write unless one is already pending."""
+        with self._lock:
+            self._dirty = True
+            if not self._atexit_registered:
+                atexit.register(self.flush)
+                self._atexit_registered = True
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._run)
+                self._timer.name = self.name
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self, force: bool = False):
+        """Writes now if anything is pending (or unconditionally with `force`)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not (self._dirty or force):
+                return
+            self._dirty = False
+        self._do_write()
+
+    def _run(self):
+        with self._lock:
+            self._timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+        self._do_write()
+
+    def _do_write(self):
+        with self._write_lock:
+            try:
+                self._write()
+            except Exception as e:
+                with self._lock:
+                    self._dirty = True  # try again on the next mark or flush
+                message = f"{self.name}: write failed: {e}"
+                if self.logger:
+                    self.logger.error(message)
+                else:
+                    print(message)
@@ -12,6 +12,7 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt, QThread
 from gui.worker import Worker
+from gui.player_bridge import PlayerBridge
 from gui.music_controls import MusicControlWidget
 
 class MainWindow(QMainWindow):
@@ -22,7 +23,10 @@ class MainWindow(QMainWindow):
         self.logger = logger
         self.thread = None
         self.worker = None
+        self.dispatcher = None  # Shared across sessions so the persistent player is reused
         self.music_controls = None
+        # Player status and transport controls outlive the per-request workers.
+        self.player_bridge = PlayerBridge(logger, parent=self)
 
         self.setWindowTitle("Personal DJ")
         self.setGeometry(100, 100, 600, 500)
@@ -86,6 +90,13 @@ class MainWindow(QMainWindow):
         self.music_controls.volume_changed.connect(self.on_volume_changed)
         self.music_controls.seek_requested.connect(self.on_seek_requested)
 
+        # Connect player status from the shared dispatcher
+        self.player_bridge.status_updated.connect(self.update_status)
+        self.player_bridge.now_playing_updated.connect(self.update_now_playing)
+        self.player_bridge.music_status_updated.connect(self.music_controls.update_status)
+        self.player_bridge.position_updated.connect(self.music_controls.set_position)
+        self.player_bridge.duration_updated.connect(self.music_controls.set_duration)
+
     def start_dj_session(self):
         """Starts the background worker to handle the DJ logic."""
         vibe = self.vibe_input.text()
@@ -98,26 +109,40 @@ class MainWindow(QMainWindow):
 
         # --- Set up the worker thread ---
         self.thread = QThread()
-        self.worker = Worker(self.logger)
+        self.worker = Worker(self.logger, dispatcher=self.dispatcher)
         self.worker.moveToThread(self.thread)
 
         # --- Connect signals and slots ---
         self.thread.started.connect(lambda: self.worker.run(vibe))
         self.worker.finished.connect(self.thread.quit)
         self.worker.finished.connect(self.worker.deleteLater)
+        # Drop the references before Qt deletes the objects behind them.
+        self.thread.finished.connect(self._on_thread_finished)
         self.thread.finished.connect(self.thread.deleteLater)
         self.worker.status_updated.connect(self.update_status)
         self.worker.now_playing_updated.connect(self.update_now_playing)
         self.worker.error_occurred.connect(self.handle_error)
-        self.worker.music_status_updated.connect(self.music_controls.update_status)
+        self.worker.dispatcher_ready.connect(self._on_dispatcher_ready)
 
         # --- Start the thread ---
         self.thread.start()
 
+    def _on_dispatcher_ready(self, dispatcher):
+        """Keeps the first session's dispatcher for every later session."""
+        self.dispatcher = dispatcher
+        self.player_bridge.attach(dispatcher)
+
+    def _on_thread_finished(self):
+        """Forgets a finished session (unless a newer one has already replaced it)."""
+        if self.sender() is self.thread:
+            self.thread = None
+            self.worker = None
+
     def stop_dj_session(self):
         """Stops the background worker."""
-        if self.worker:
-            self.worker.stop()
+        if self.dispatcher:
+            self.status_label.setText("Stopping...")
+            self.player_bridge.stop_music()  # cancels the request, so the worker finishes too
         if self.thread and self.thread.isRunning():
             self.thread.quit()
             self.thread.wait()
@@ -145,34 +170,30 @@ class MainWindow(QMainWindow):
         if self.thread and self.thread.isRunning():
             self.thread.quit()
             self.thread.wait() # Wait for the thread to finish
+        if self.dispatcher:
+            self.dispatcher.shutdown()
         QApplication.quit()
     
     def on_play_requested(self):
         """Handle play request from music controls."""
-        if self.worker:
-            self.worker.resume_music()
+        self.player_bridge.resume_music()
     
     def on_pause_requested(self):
         """Handle pause request from music controls."""
-        if self.worker:
-            self.worker.pause_music()
+        self.player_bridge.pause_music()
     
     def on_stop_requested(self):
         """Handle stop request from music controls."""
-        if self.worker:
-            self.worker.stop_music()
+        self.player_bridge.stop_music()
     
     def on_skip_requested(self):
         """Handle skip request from music controls."""
-        if self.worker:
-            self.worker.skip_track()
+        self.player_bridge.skip_track()
     
     def on_volume_changed(self, volume):
         """Handle volume change from music controls."""
-        if self.worker:
-            self.worker.set_volume(volume)
+        self.player_bridge.set_volume(volume)
     
     def on_seek_requested(self, position):
         """Handle seek request from music controls."""
-        if self.worker:
-            self.worker.seek_to(position)
+        self.player_bridge.seek_to(position)
@@ -4,7 +4,7 @@ Music Control Widget for Personal DJ GUI
 This module provides a comprehensive music control interface including:
 - Play/Pause/Stop/Skip buttons
 - Volume control slider
-- Progress bar with position display
+- Progress bar with position display, driven by position/duration pushed from the player
 - Current track information
 - Playlist controls
 """
@@ -13,7 +13,7 @@ from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QSlider, 
     QLabel, QProgressBar, QFrame, QSizePolicy
 )
-from PySide6.QtCore import Qt, QTimer, Signal
+from PySide6.QtCore import Qt, Signal
 from PySide6.QtGui import QFont, QPalette
 
 
@@ -36,9 +36,9 @@ class MusicControlWidget(QWidget):
         self.position = 0
         self.duration = 0
         self.volume = 70
+        self._seeking = False  # True while the user drags the progress slider
         
         self.setup_ui()
-        self.setup_timer()
         
     def setup_ui(self):
         """Set up the user interface."""
@@ -176,12 +176,6 @@ class MusicControlWidget(QWidget):
         
         layout.addWidget(volume_frame)
         
-    def setup_timer(self):
-        """Set up timer for updating progress."""
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self.update_progress)
-        self.update_timer.start(1000)  # Update every second
-        
     def apply_styling(self):
         """Apply custom styling to the widget."""
         self.setStyleSheet("""
@@ -274,14 +268,14 @@ class MusicControlWidget(QWidget):
         
     def on_progress_pressed(self):
         """Handle progress bar press."""
-        self.update_timer.stop()
+        self._seeking = True
         
     def on_progress_released(self):
         """Handle progress bar release."""
         if self.duration > 0:
             seek_position = (self.progress_bar.value() / 100) * self.duration
             self.seek_requested.emit(int(seek_position))
-        self.update_timer.start()
+        self._seeking = False
         
     def update_status(self, status, track_title=None, source_info=None):
         """Update the control widget status."""
@@ -327,18 +321,6 @@ class MusicControlWidget(QWidget):
                 self.volume_slider.setValue(self.volume)
                 self.volume_value_label.setText(f"{self.volume}%")
                 
-    def update_progress(self):
-        """Update progress bar and time display."""
-        if self.is_playing and not self.is_paused:
-            self.position += 1
-            
-        if self.duration > 0:
-            progress = (self.position / self.duration) * 100
-            self.progress_bar.setValue(int(progress))
-            
-        self.current_time_label.setText(self.format_time(self.position))
-        self.total_time_label.setText(self.format_time(self.duration))
-        
     def set_duration(self, duration):
         """Set track duration."""
         self.duration = duration
@@ -347,7 +329,7 @@ class MusicControlWidget(QWidget):
     def set_position(self, position):
         """Set current position."""
         self.position = position
-        if self.duration > 0:
+        if self.duration > 0 and not self._seeking:
             progress = (position / self.duration) * 100
             self.progress_bar.setValue(int(progress))
         self.current_time_label.setText(self.format_time(position))
@@ -0,0 +1,86 @@
+"""
+Player Bridge for Personal DJ GUI
+
+Connects the music controls to the shared dispatcher for the whole window lifetime:
+- Relays player status, position and duration from the MusicAgent to the UI
+- Handles play/pause/stop/skip/volume/seek requests from the music controls
+- Lives in the GUI thread and is owned by MainWindow, unlike the per-request
+  Worker, which is deleted as soon as its vibe has been queued
+"""
+
+from PySide6.QtCore import QObject, Signal
+
+
+class PlayerBridge(QObject):
+    """Long-lived link between the music controls and the dispatcher's player."""
+
+    status_updated = Signal(str)  # Status messages for the UI
+    now_playing_updated = Signal(str)  # The current track name
+    music_status_updated = Signal(str, str)  # Music status updates (status, track_title)
+    position_updated = Signal(float)  # Playback position in seconds, pushed by the player
+    duration_updated = Signal(float)  # Track duration in seconds, pushed by the player
+
+    def __init__(self, logger, parent=None):
+        super().__init__(parent)
+        self.logger = logger
+        self.dispatcher = None
+        self._music_agent = None
+
+    def attach(self, dispatcher):
+        """Binds the bridge to the dispatcher shared by every session."""
+        self.dispatcher = dispatcher
+        self._music_agent = dispatcher.music_agent
+        # Called from the player's threads; the signals are queued to the GUI thread.
+        self._music_agent.set_status_callback(self._on_music_status_changed)
+
+    def _on_music_status_changed(self, status, data):
+        """Handle music status changes from the music agent."""
+        if status == "position":
+            self.position_updated.emit(float(data))
+            return
+        if status == "duration":
+            self.duration_updated.emit(float(data))
+            return
+
+        # Get additional source info if available
+        source_info = ""
+        if self._music_agent and hasattr(self._music_agent, 'get_source_info'):
+            source_info = self._music_agent.get_source_info()
+
+        self.music_status_updated.emit(status, source_info if source_info != "No active source" else data or "")
+
+    def pause_music(self):
+        """Pause the currently playing music."""
+        if self._music_agent:
+            self._music_agent.pause()
+
+    def resume_music(self):
+        """Resume paused music."""
+        if self._music_agent:
+            self._music_agent.resume()
+
+    def stop_music(self):
+        """Stop the currently playing music (and any request still in flight)."""
+        if self.dispatcher:
+            self.dispatcher.stop()
+            self.now_playing_updated.emit("None")
+
+    def skip_track(self):
+        """Skip to the prefetched next track, or stop if nothing is ready yet."""
+        if self.dispatcher:
+            bundle = self.dispatcher.skip()
+            if bundle:
+                self.now_playing_updated.emit(bundle.track_title or "Unknown Track")
+                self.status_updated.emit(f"DJ: {bundle.commentary}")
+            else:
+                self.status_updated.emit("Track skipped. Ready for a new vibe.")
+
+    def set_volume(self, volume):
+        """Set the music volume."""
+        if self._music_agent:
+            self._music_agent.set_volume(volume)
+
+    def seek_to(self, position):
+        """Seek to a specific position in the track."""
+        if self._music_agent:
+            self._music_agent.seek(position)
@@ -9,13 +9,19 @@ Flow:
 2. DJAgent generates commentary + track choice.
 3. VoiceAgent converts commentary to speech.
 4. MusicAgent plays commentary audio, then the chosen song.
+
+Steps 2-4 run in the background pipeline (core/pipeline.py), so the prompt
+is back right away and a new vibe replaces one that's still in progress.
 """
 
+import multiprocessing
 import sys
 from PySide6.QtWidgets import QApplication
 
 from core.log_setup import setup_logging
 from core.dispatcher import Dispatcher
+from core.metrics import metrics
+from core.metrics_server import start_metrics_server
 from gui.main_window import MainWindow
 
 # Set up logging at the application's entry point
@@ -24,20 +30,37 @@ logger = setup_logging()
 def run_gui():
     """Initializes and runs the GUI for the Personal DJ application."""
     logger.info("--- Starting Personal DJ GUI ---")
+    metrics_server = None
     try:
         app = QApplication(sys.argv)
         window = MainWindow(logger)
+        # The window creates its dispatcher with the first session, so it's looked up per scrape.
+        metrics_server = start_metrics_server(logger, lambda: window.dispatcher)
         window.show()
         sys.exit(app.exec())
     except Exception as e:
         logger.critical(f"An unexpected error occurred while launching the GUI: {e}", exc_info=True)
     finally:
+        if metrics_server:
+            metrics_server.shutdown()
         logger.info("--- Personal DJ GUI has shut down ---")
 
+def _print_pipeline_event(event: str, data):
+    """Prints DJ pipeline progress (called from pipeline threads)."""
+    if event == "sentence":
+        print(f"\nDJ Echo: {data}", flush=True)
+    elif event == "now_playing":
+        print(f"Now Playing: {data}", flush=True)
+    elif event == "no_track":
+        print("No music track was selected.", flush=True)
+    elif event == "error":
+        print(f"Something went wrong: {data}", flush=True)
+
 def run_cli():
     """Runs the Personal DJ application in command-line interface mode."""
     logger.info("--- Starting Personal DJ CLI ---")
     dispatcher = Dispatcher(logger)
+    metrics_server = start_metrics_server(logger, lambda: dispatcher)
     print("🎧  Local AI-DJ ready. Available commands:")
     print("  • Enter a vibe to start music")
     print("  • 'pause' - pause current track")
@@ -46,6 +69,7 @@ def run_cli():
     print("  • 'skip' - skip current track")
     print("  • 'volume <0-100>' - set volume")
     print("  • 'status' - show current status")
+    print("  • 'metrics [file]' - dump latency metrics as JSON")
     print("  • 'quit' - exit")
 
     try:
@@ -56,7 +80,7 @@ def run_cli():
                 break
             elif user_msg.lower() == "stop":
                 logger.info("Stopping music playback.")
-                dispatcher.music_agent.stop()
+                dispatcher.stop()
                 print("Playback stopped.")
                 continue
             elif user_msg.lower() == "pause":
@@ -72,8 +96,12 @@ def run_cli():
                     print("No music to resume or not paused.")
                 continue
             elif user_msg.lower() == "skip":
-                dispatcher.music_agent.stop()
-                print("Track skipped. Ready for a new vibe.")
+                bundle = dispatcher.skip()
+                if bundle:
+                    print(f"\nDJ Echo: {bundle.commentary}")
+                    print(f"Now Playing: {bundle.track_title}")
+                else:
+                    print("Track skipped. Ready for a new vibe.")
                 continue
             elif user_msg.lower().startswith("volume "):
                 try:
@@ -95,27 +123,55 @@ def run_cli():
                     print(f"Source: {status['source_info']}")
                 else:
                     print(f"Player: {dispatcher.music_agent.get_player_info()}")
-                continue
-
-            commentary, track_title, track_url = dispatcher.dj_agent.respond(user_msg)
-            print(f"\nDJ Echo: {commentary}")
 
-            commentary_audio_path = dispatcher.voice_agent.speak(commentary)
-            if commentary_audio_path:
-                dispatcher.music_agent.play_track(commentary_audio_path)
+                cache_stats = dispatcher.dj_agent.commentary_cache.stats()
+                print(f"Commentary cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                      f"{cache_stats['evictions']} evictions ({cache_stats['hit_ratio']:.0%} hit ratio)")
+                tts_stats = dispatcher.voice_agent.tts_cache.stats()
+                print(f"TTS cache: {tts_stats['entries']} clips ({tts_stats['bytes'] / 1_048_576:.1f} MB), "
+                      f"{tts_stats['hits']} hits, {tts_stats['misses']} misses ({tts_stats['hit_ratio']:.0%} hit ratio)")
+                source_totals = dispatcher.music_agent.source_detector.get_source_totals()
+                if source_totals:
+                    print("Sources: " + ", ".join(
+                        f"{source_type} {int(t['sources'])} ({int(t['plays'])} plays, {int(t['failures'])} failures, "
+                        f"{t['play_seconds'] / 60:.0f} min)"
+                        for source_type, t in source_totals.items()
+                    ))
+                if dispatcher.dj_agent.track_pool:
+                    pool_stats = dispatcher.dj_agent.track_pool.stats()
+                    print(f"Track pool: {pool_stats['available']} ready, {pool_stats['hits']} hits, "
+                          f"{pool_stats['misses']} misses, {pool_stats['refills']} refills")
+                latencies = metrics.snapshot()["histograms"]
+                if latencies:
+                    print("Latency (p50 / p95 / p99):")
+                    for name, stats in latencies.items():
+                        print(f"  {name}: {stats['p50_ms']:.0f} / {stats['p95_ms']:.0f} / {stats['p99_ms']:.0f} ms "
+                              f"({stats['count']} samples)")
+                continue
+            elif user_msg.lower() == "metrics" or user_msg.lower().startswith("metrics "):
+                parts = user_msg.split(maxsplit=1)
+                if len(parts) > 1:
+                    try:
+                        metrics.dump_json(parts[1])
+                        print(f"Metrics written to {parts[1]}")
+                    except OSError as e:
+                        print(f"Could not write metrics: {e}")
+                else:
+                    print(metrics.dump_json())
+                continue
 
-            if track_url:
-                print(f"Now Playing: {track_title}")
-                dispatcher.music_agent.play_track(track_url, track_title)
-            else:
-                print("No music track was selected.")
+            if not user_msg:
+                continue
+            dispatcher.submit(user_msg, on_event=_print_pipeline_event)
 
     except KeyboardInterrupt:
         logger.info("CLI interrupted by user.")
     except Exception as e:
         logger.critical(f"An unexpected error occurred in the CLI: {e}", exc_info=True)
     finally:
-        dispatcher.music_agent.stop()  # Ensure music is stopped on exit
+        if metrics_server:
+            metrics_server.shutdown()
+        dispatcher.shutdown()  # Ensure music and background work are stopped on exit
         logger.info("--- Personal DJ CLI has shut down ---")
 
 def main():
@@ -126,4 +182,7 @@ def main():
         run_gui()
 
 if __name__ == "__main__":
+    # Lets the frozen Windows build start the local TTS worker processes
+    # instead of relaunching the whole app for each of them.
+    multiprocessing.freeze_support()
     main()